@@ -101,16 +101,17 @@ class Paser:
     scale_border_and_shadow = False
     color_matrix = ColorMatrix.TV_709
 
-    styles = {
-        'Default': Style()
-    }
-    events = []
-
     def __init__(
             self,
             ass_file: Union[str, Path, TextIOWrapper],
             encoding: str = 'utf-8-sig'
     ):
+        # every parser owns its records, class level containers would be shared by all instances
+        self.styles = {
+            'Default': Style()
+        }
+        self.events = []
+
         # load archive file
         if isinstance(ass_file, (str, Path)):
             ass_file = open(ass_file, 'r', encoding=encoding)
@@ -1,90 +1,322 @@
-from typing import Union
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+from typing import Union, Iterable, TextIO
+import copy
+import io
 import pathlib
 import _io
-import os.path
-import re
+from .errors import ASSFileError
+from .tokenizer import classify, normalize_name, parse_format, SECTION, FORMAT, ENTRY, UNKNOWN
+from .records import (
+    Style, Event, Dialogue, Comment, Picture, Sound, Movie, Command, EventTypes,
+    DefaultStyleFormat, DefaultEventFormat
+)
+from .charset import detect_encoding
+from .stream import open_lines, iter_events
+from .table import EventTable
+from .interval import IntervalIndex
+from .resolve import StyleResolver
+from .attachments import Attachment, AttachmentReader, NamePrefixes
+from .profiling import ParseProfiler, ParseStats, hooks_enabled
+from .collisions import find_collisions, screen_position, ScreenPosition, Collision
+from .mapped import MappedASS
+from .retime import retime, load_keyframes
+from .karaoke import Karaoke, Syllable, KaraokeTags, parse_karaoke, has_karaoke, scale_karaoke, syllable_table
+from .merge import diff_documents, merge_documents, DocumentDiff, MergeResult, Change, Conflict
+from .writer import iter_lines, iter_event_lines, write_lines
 
 
 class ASS:
     def __init__(
             self,
-            ass: Union[str, pathlib.Path, _io.TextIOWrapper],
-            encoding: str = 'utf-8-sig'
+            ass: Union[str, bytes, pathlib.Path, _io.TextIOWrapper, _io.BufferedReader, None] = None,
+            encoding: str = 'utf-8-sig',
+            profiler: Union[ParseProfiler, None] = None
     ):
-        if isinstance(ass, str):
-            if os.path.exists(ass):
-                ass = pathlib.Path(ass)
-            else:
-                ass_content = ass
-        if isinstance(ass, pathlib.Path):
-            ass = open(ass, 'r', encoding=encoding)
-        if isinstance(ass, _io.TextIOWrapper):
-            ass_content = ass.read()
-            ass.close()
-        ass_lines = iter(re.split(r'\r?\n', ass_content))
-
-        # for line in iter(re.split(r'\r?\n', ass_content)):
-        #     line = line.strip()
-        #     section_name = re.findall(r'^\[(.*)]$', line)
-        #     if section_name:
-        #         section_name = section_name[0]
-        #         continue
-
-        section_name = re.findall(r'^\[(.*)]$', next(ass_lines))
-        while True:
-            if section_name:
-                section_name = section_name[0]
-                if section_name == 'Script Info':
-                    section_name = self.__parse_script_info(ass_lines)
-                elif re.match(r'V4\+? Styles', section_name):
-                    section_name = self.__parse_styles(ass_lines)
-                elif section_name == 'Events':
-                    section_name = self.__parse_events(ass_lines)
-            try:
-                line = next(ass_lines)
-            except StopIteration:
-                break
-            section_name = re.findall(r'^\[(.*)]$', line)
-
-    def __parse_script_info(self, ass_lines: iter) -> Union[str, None]:
-        for line in ass_lines:
-            line = line.strip()
-            if re.match(r'^[;|!]|^\s*$', line):
-                continue
-            section_name = re.findall(r'^\[(.*)]$', line)
-            if section_name:
-                return section_name[0]
+        """
+        Parameters
+        ----------
+        ass : str, bytes, Path or opened file, optional
+            Path, content or raw bytes of the script, None for an empty script.
+        encoding : str
+            Codec of paths, bytes and binary files, 'auto' to detect it.
+        profiler : ParseProfiler, optional
+            Collects per-phase stats into 'parse_stats'. One is created for every parse
+            while hooks are registered with 'profiling.add_hook'.
+        """
+        self.script_info = {}
+        self.styles = {}
+        self.events = []
+        self.style_format = DefaultStyleFormat
+        self.event_format = DefaultEventFormat
+        self.nonstandard_sections = {}
+        self.fonts = []
+        self.graphics = []
+        self.__interval_index = None
+        self.__style_resolver = None
+        # ids of the records copied since the last 'clone', None while nothing is shared
+        self.__owned = None
 
-            header, value = re.split(r'\s*:\s*', line, maxsplit=1)
-            self.__setattr__(header, value)
+        self.parse_stats = None
 
-        return None
+        if ass is None:
+            return
 
-    def __parse_styles(self, ass_lines: iter) -> Union[str, None]:
-        for line in ass_lines:
-            line = line.strip()
-            if re.match(r'^[;|!]|^\s*$', line):
-                continue
-            section_name = re.findall(r'^\[(.*)]$', line)
-            if section_name:
-                return section_name[0]
+        if profiler is None and hooks_enabled():
+            profiler = ParseProfiler()
+        if profiler is None:
+            with open_lines(ass, encoding) as ass_lines:
+                self.__parse(ass_lines)
+            return
+
+        profiler.start(ass)
+        try:
+            with open_lines(ass, encoding) as ass_lines:
+                profiler.enter('preamble')
+                self.__parse(profiler.wrap(ass_lines), profiler)
+            self.parse_stats = profiler.finish(self)
+        finally:
+            # nothing left to do after 'finish', stops tracing when the parse failed
+            profiler.abort()
+
+    def event_table(self) -> EventTable:
+        """
+        Returns
+        -------
+        Out : EventTable
+            Columnar view of 'events', call 'apply' on it to write changes back.
+            Events shared with a clone are copied first, as 'apply' changes them in place.
+        """
+        self.own_events()
+        return EventTable(self.events)
+
+    def retime(self, *args, **kwargs) -> list:
+        """ Retime every event in place, see 'retime.retime' for the parameters. """
+        self.invalidate_index()
+        self.own_events()
+        return retime(self.events, *args, **kwargs)
+
+    def scale_karaoke(self, factor: float) -> int:
+        """
+        Scale the syllables of every karaoke line, see 'karaoke.scale_karaoke'.
+        Only those events are copied off a clone, the others are neither copied nor parsed.
+        """
+        changed = 0
+        for index, event in enumerate(self.events):
+            if has_karaoke(event.text) and len(event.karaoke):
+                event = self.own_event(index)
+                event.karaoke = event.karaoke.scaled(factor)
+                changed += 1
+        return changed
+
+    def clone(self) -> 'ASS':
+        """
+        A copy that shares its style and event records with this script.
+
+        Only the containers are copied. From then on a record is copied the first time
+        'own_event' or 'own_style' is called for it in either script, so records changed through
+        them, or replaced in the containers, never show in the other script.
+
+        Returns
+        -------
+        Out : ASS
+            The new script, of the same type as this one.
+        """
+        clone = copy.copy(self)
+        clone.script_info = dict(self.script_info)
+        clone.styles = dict(self.styles)
+        clone.events = list(self.events)
+        clone.nonstandard_sections = {name: list(lines) for name, lines in self.nonstandard_sections.items()}
+        clone.fonts = list(self.fonts)
+        clone.graphics = list(self.graphics)
+        clone.__style_resolver = None
+        self.__owned = set()
+        clone.__owned = set()
+        return clone
+
+    def own_event(self, index: int) -> Event:
+        """
+        Returns
+        -------
+        Out : Event
+            The event at 'index', copied first if it is still shared with a clone, safe to change in place.
+        """
+        event = self.events[index]
+        if self.__owned is not None and id(event) not in self.__owned:
+            event = self.events[index] = event.copy()
+            self.__owned.add(id(event))
+            self.invalidate_index()
+        return event
+
+    def own_style(self, name: str) -> Style:
+        """
+        Returns
+        -------
+        Out : Style
+            The style called 'name', copied first if it is still shared with a clone, safe to change in place.
+        """
+        style = self.styles[name]
+        if self.__owned is not None and id(style) not in self.__owned:
+            style = self.styles[name] = style.copy()
+            self.__owned.add(id(style))
+        # the caller is about to change it
+        self.invalidate_styles()
+        return style
+
+    def own_events(self):
+        """ Copy every event still shared with a clone. """
+        if self.__owned is None:
+            return
+
+        owned = self.__owned
+        for index, event in enumerate(self.events):
+            if id(event) not in owned:
+                event = self.events[index] = event.copy()
+                owned.add(id(event))
+                self.__interval_index = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_ASS__interval_index'] = None
+        state['_ASS__style_resolver'] = None
+        state['_ASS__owned'] = None
+        state['parse_stats'] = None
+        return state
+
+    def dump(
+            self,
+            file: Union[str, pathlib.Path, TextIO],
+            encoding: str = 'utf-8-sig'
+    ) -> int:
+        """
+        Stream the script into a path or an opened text file.
+
+        Returns
+        -------
+        Out : int
+            Number of characters written.
+        """
+        if isinstance(file, (str, pathlib.Path)):
+            with open(file, 'w', encoding=encoding) as file:
+                return write_lines(iter_lines(self), file)
+        return write_lines(iter_lines(self), file)
+
+    def to_text(self) -> str:
+        text = io.StringIO()
+        self.dump(text)
+        return text.getvalue()
+
+    @property
+    def interval_index(self) -> IntervalIndex:
+        """ Built on first use, call 'invalidate_index' after events or their times change. """
+        if self.__interval_index is None:
+            self.__interval_index = IntervalIndex(self.events)
+        return self.__interval_index
+
+    def invalidate_index(self):
+        self.__interval_index = None
+
+    def events_at(self, time: int) -> list:
+        """ Events visible at 'time' centiseconds. """
+        return self.interval_index.events_at(time)
+
+    def events_between(self, start: int, end: int) -> list:
+        """ Events overlapping [start, end) in centiseconds. """
+        return self.interval_index.events_between(start, end)
+
+    def overlapping_events(self):
+        """ Pairs of events shown at the same time. """
+        return self.interval_index.overlaps()
+
+    def collisions(self, include_comments: bool = False) -> list:
+        """ Events shown at the same time and place, see 'collisions.find_collisions'. """
+        return list(find_collisions(self.events, self.styles, include_comments))
 
-            pass  # TODO
+    @property
+    def style_resolver(self) -> StyleResolver:
+        """ Built on first use, call 'invalidate_styles' after a style is changed in place. """
+        if self.__style_resolver is None:
+            self.__style_resolver = StyleResolver(self.styles)
+        return self.__style_resolver
 
-        return None
+    def invalidate_styles(self):
+        if self.__style_resolver is not None:
+            self.__style_resolver.invalidate()
 
-    def __parse_events(self, ass_lines: iter) -> Union[str, None]:
+    def event_style(self, event: Event) -> Style:
+        """ Effective style of 'event' with its leading overrides folded in, see 'StyleResolver'. """
+        return self.style_resolver.event_style(event)
+
+    def style_runs(self, event: Event) -> tuple:
+        """ (kind, text, effective style) of every text run of 'event', see 'StyleResolver.runs'. """
+        return self.style_resolver.runs(event)
+
+    def __parse(self, ass_lines: Iterable[str], profiler: Union[ParseProfiler, None] = None):
+        section_name = None
+        parser = None
+        # reader of a '[Fonts]' or '[Graphics]' section, whose data lines must not be classified
+        attachments = None
         for line in ass_lines:
-            line = line.strip()
-            if re.match(r'^[;|!]|^\s*$', line):
+            if attachments is not None and attachments.feed(line):
                 continue
-            section_name = re.findall(r'^\[(.*)]$', line)
-            if section_name:
-                return section_name[0]
 
-            pass  # TODO
+            kind, key, value = classify(line)
+            if kind == SECTION:
+                if attachments is not None:
+                    getattr(self, attachments.section_key).extend(attachments.close())
+                    attachments = None
+                section_name = key
+                section_key = normalize_name(key)
+                if profiler is not None:
+                    profiler.enter_section(section_key)
+                if section_key in NamePrefixes:
+                    parser, attachments = None, AttachmentReader(section_key)
+                else:
+                    parser = self.__section_parsers.get(section_key, ASS.__parse_nonstandard)
+            elif parser is not None and (kind == ENTRY or kind == FORMAT or kind == UNKNOWN):
+                parser(self, section_name, kind, key, value)
+
+        if attachments is not None:
+            getattr(self, attachments.section_key).extend(attachments.close())
+
+    def __parse_script_info(self, section_name: str, kind: int, key: str, value: str):
+        if kind == UNKNOWN:
+            return
+
+        self.script_info[key] = value
+
+    def __parse_styles(self, section_name: str, kind: int, key: str, value: str):
+        if kind == FORMAT:
+            self.style_format = parse_format(value)
+        elif kind == ENTRY and key == 'Style':
+            style = Style(value, self.style_format)
+            self.styles[style.name] = style
+
+    def __parse_events(self, section_name: str, kind: int, key: str, value: str):
+        if kind == FORMAT:
+            self.event_format = parse_format(value)
+        elif kind == ENTRY:
+            event_type = EventTypes.get(key)
+            if event_type is not None:
+                self.events.append(event_type(value, self.event_format))
+
+    def __parse_nonstandard(self, section_name: str, kind: int, key: str, value: str):
+        if section_name not in self.nonstandard_sections:
+            self.nonstandard_sections[section_name] = []
+
+        self.nonstandard_sections[section_name].append(
+            value if kind == UNKNOWN else '{}: {}'.format(key, value)
+        )
 
-        return None
+    __section_parsers = {
+        'scriptinfo': __parse_script_info,
+        'v4+styles': __parse_styles,
+        'v4styles': __parse_styles,
+        'events': __parse_events
+    }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,210 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Fonts and pictures embedded in the '[Fonts]' and '[Graphics]' sections.
+#
+# SSA stores them with a variant of uuencode: every 3 bytes are split into four 6-bit values
+# written as chr(value + 33), 80 characters per line, and a last group of 1 or 2 bytes
+# is written as 2 or 3 characters. This is base64 with another alphabet and without padding,
+# so both directions are a 'bytes.translate' and a base64 call, all in C.
+
+from typing import Callable, Iterable, Iterator, List, Union
+import base64
+import binascii
+import io
+import pathlib
+import re
+from .errors import ASSFileError
+
+LINE_LENGTH = 80
+
+# Prefix of the line naming each attachment, by normalized section name
+NamePrefixes = {
+    'fonts': 'fontname:',
+    'graphics': 'filename:'
+}
+
+_BASE64 = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+_SSA = bytes(range(33, 97))
+# characters outside the SSA alphabet become '*', which the strict base64 decoder rejects
+_FROM_SSA = bytes(_BASE64[_SSA.index(byte)] if byte in _SSA else ord('*') for byte in range(256))
+_TO_SSA = bytes.maketrans(_BASE64, _SSA)
+_DATA_LINE = re.compile('[!-`]{1,%d}' % LINE_LENGTH)
+
+
+def decode(encoded: Union[str, bytes]) -> bytes:
+    """
+    Parameters
+    ----------
+    encoded : str or bytes
+        SSA uuencoded text, line breaks and spaces are ignored.
+
+    Returns
+    -------
+    Out : bytes
+        The embedded file.
+    """
+    if isinstance(encoded, str):
+        encoded = encoded.encode('ascii', 'replace')
+    encoded = encoded.translate(_FROM_SSA, b' \t\r\n')
+    if len(encoded) % 4 == 1:
+        # a single character holds less than a byte
+        encoded = encoded[:-1]
+    try:
+        return base64.b64decode(encoded + b'=' * (-len(encoded) % 4), validate=True)
+    except binascii.Error:
+        raise ASSFileError('Invalid embedded file data') from None
+
+
+def encode(data: Union[bytes, memoryview]) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        SSA uuencoded text of 'data' on a single line.
+    """
+    return base64.b64encode(data).rstrip(b'=').translate(_TO_SSA).decode('ascii')
+
+
+def decoded_size(length: int) -> int:
+    """ Size in bytes of the data behind 'length' encoded characters. """
+    return length // 4 * 3 + (0, 0, 1, 2)[length % 4]
+
+
+class Attachment:
+    """
+    One embedded file.
+
+    The encoded text is kept as found and only decoded when 'data', 'view' or 'open' is used,
+    so a script with several MB of fonts opens, and is written back, without decoding them.
+    'encoded' may also be a function returning the text, for sources that read it on demand.
+    """
+    __slots__ = ('name', '__encoded', '__data')
+
+    def __init__(
+            self,
+            name: str,
+            encoded: Union[str, bytes, Callable[[], bytes], None] = None,
+            data: Union[bytes, None] = None
+    ):
+        self.name = name
+        self.__encoded = encoded
+        self.__data = data
+
+    @classmethod
+    def from_file(cls, path: Union[str, pathlib.Path], name: Union[str, None] = None) -> 'Attachment':
+        path = pathlib.Path(path)
+        return cls(path.name if name is None else name, data=path.read_bytes())
+
+    def __encoded_text(self) -> Union[str, bytes]:
+        encoded = self.__encoded
+        return encoded() if callable(encoded) else encoded
+
+    @property
+    def data(self) -> bytes:
+        """ Decoded on first access and kept. """
+        if self.__data is None:
+            self.__data = decode(self.__encoded_text())
+        return self.__data
+
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    def open(self) -> io.BytesIO:
+        """ A stream over 'data', which shares its buffer until written to. """
+        return io.BytesIO(self.data)
+
+    def __len__(self):
+        encoded = self.__encoded
+        if self.__data is None and isinstance(encoded, str):
+            # the size follows from the text, no need to decode
+            return decoded_size(len(encoded) - sum(map(encoded.count, ' \t\r\n')))
+        return len(self.data)
+
+    def iter_lines(self, prefix: str) -> Iterator[str]:
+        """
+        Returns
+        -------
+        Out : iterator
+            'prefix' and the name, then the encoded data in lines of 80 characters, with line endings.
+        """
+        yield '{} {}\n'.format(prefix, self.name)
+        if self.__encoded is None:
+            encoded = encode(self.__data)
+        else:
+            encoded = self.__encoded_text()
+            if isinstance(encoded, (bytes, bytearray)):
+                encoded = encoded.decode('ascii', 'replace')
+            encoded = ''.join(encoded.split())
+        for position in range(0, len(encoded), LINE_LENGTH):
+            yield encoded[position:position + LINE_LENGTH] + '\n'
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(type(self).__name__, self.name)
+
+
+class AttachmentReader:
+    """
+    Reads the raw lines of a '[Fonts]' or '[Graphics]' section one by one.
+
+    As in Aegisub, lines of at most 80 characters from the SSA alphabet belong to the current
+    attachment even when they look like a section header or a comment, and a line shorter
+    than 80 characters ends it.
+    """
+
+    def __init__(self, section_key: str):
+        self.section_key = section_key
+        self.prefix = NamePrefixes[section_key]
+        self.attachments = []
+        self.__name = None
+        self.__chunks = []
+
+    def feed(self, line: str) -> bool:
+        """
+        Returns
+        -------
+        Out : bool
+            Whether the line was taken, otherwise it is outside of any attachment
+            and should be read as an ordinary line.
+        """
+        line = line.strip()
+        if line.startswith(self.prefix):
+            self.close()
+            self.__name = line[len(self.prefix):].strip()
+            return True
+        if self.__name is not None and _DATA_LINE.fullmatch(line):
+            self.__chunks.append(line)
+            if len(line) < LINE_LENGTH:
+                self.close()
+            return True
+        return False
+
+    def close(self) -> List[Attachment]:
+        """ Finish the current attachment, returns every attachment read so far. """
+        if self.__name is not None:
+            self.attachments.append(Attachment(self.__name, ''.join(self.__chunks)))
+            self.__name, self.__chunks = None, []
+        return self.attachments
+
+
+def read_attachments(section_key: str, lines: Iterable[str]) -> List[Attachment]:
+    """
+    Parameters
+    ----------
+    section_key : str
+        'fonts' or 'graphics'.
+    lines : iterable of str
+        Raw lines of the section body.
+
+    Returns
+    -------
+    Out : list
+        Attachments in file order, the data of each joined into one string.
+    """
+    reader = AttachmentReader(section_key)
+    for line in lines:
+        reader.feed(line)
+    return reader.close()
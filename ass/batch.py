@@ -0,0 +1,142 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Parse many scripts across processes.
+# Usage: python -m ass.batch <directory | glob | file>... [--workers N] [--json]
+
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import json
+import os
+import pathlib
+from .stream import iter_events
+from .timestamp import format_time
+
+SCRIPT_SUFFIXES = ('.ass', '.ssa')
+
+
+class FileSummary(NamedTuple):
+    path: str
+    events: int = 0
+    start: Optional[int] = None
+    end: Optional[int] = None
+    styles: Tuple[str, ...] = ()
+    error: Optional[str] = None
+
+
+def summarize(path: str, encoding: str = 'utf-8-sig') -> FileSummary:
+    """
+    Stream the events of one script.
+
+    Returns
+    -------
+    Out : FileSummary
+        Event count, earliest start and latest end in centiseconds and the sorted styles used.
+    """
+    count, start, end, styles = 0, None, None, set()
+    for event in iter_events(pathlib.Path(path), encoding):
+        count += 1
+        start = event.start if start is None else min(start, event.start)
+        end = event.end if end is None else max(end, event.end)
+        styles.add(event.style)
+    return FileSummary(path, count, start, end, tuple(sorted(styles)))
+
+
+def collect_paths(sources: Iterable[Union[str, pathlib.Path]]) -> List[str]:
+    """
+    Returns
+    -------
+    Out : list
+        Scripts found in directories (recursively), glob patterns and plain paths, in sorted order.
+    """
+    paths = set()
+    for source in sources:
+        source = str(source)
+        if os.path.isdir(source):
+            candidates = (str(path) for path in pathlib.Path(source).rglob('*'))
+        elif os.path.isfile(source):
+            paths.add(source)
+            continue
+        else:
+            candidates = glob.iglob(source, recursive=True)
+
+        paths.update(
+            path for path in candidates
+            if path.lower().endswith(SCRIPT_SUFFIXES) and os.path.isfile(path)
+        )
+    return sorted(paths)
+
+
+def _run(task: tuple):
+    function, path, encoding = task
+    try:
+        return function(path, encoding)
+    except Exception as error:
+        return FileSummary(path, error='{}: {}'.format(type(error).__name__, error))
+
+
+def parse_files(
+        sources: Iterable[Union[str, pathlib.Path]],
+        function: Callable = summarize,
+        encoding: str = 'utf-8-sig',
+        workers: Optional[int] = None
+) -> list:
+    """
+    Run 'function(path, encoding)' over every script of 'sources' in a process pool.
+
+    Parameters
+    ----------
+    sources : iterable
+        Directories, glob patterns or paths.
+    function : callable
+        A picklable top level function, such as 'summarize' or 'ASS'.
+    workers : int, optional
+        Number of processes, 'os.cpu_count()' by default.
+
+    Returns
+    -------
+    Out : list
+        Results in path order.
+        A file that raises gives a 'FileSummary' with 'error' set instead of aborting the batch.
+    """
+    paths = collect_paths(sources)
+    tasks = [(function, path, encoding) for path in paths]
+    if not tasks:
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    chunk_size = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run, tasks, chunksize=chunk_size))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parse SSA/ASS scripts in parallel and summarize them.')
+    parser.add_argument('sources', nargs='+', help='directories, glob patterns or files')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--encoding', default='utf-8-sig', help="a codec name, or 'auto' to detect it per file")
+    parser.add_argument('--json', action='store_true', help='print one JSON object per file')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for summary in parse_files(args.sources, encoding=args.encoding, workers=args.workers):
+        failed += summary.error is not None
+        if args.json:
+            print(json.dumps(summary._asdict(), ensure_ascii=False))
+        elif summary.error is not None:
+            print('{}\tERROR\t{}'.format(summary.path, summary.error))
+        else:
+            print('{}\t{} events\t{}-{}\t{}'.format(
+                summary.path, summary.events,
+                format_time(summary.start or 0), format_time(summary.end or 0), ','.join(summary.styles)
+            ))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Usage: python -m ass.benchmark [path] [--repeat N]
+#        python -m ass.benchmark --synthetic 10000,100000,1000000 [--newline crlf] [--no-tags] [--no-cjk]
+
+from typing import Callable, List
+import argparse
+import os
+import pathlib
+import re
+import tempfile
+import time
+import tracemalloc
+from . import ASS, iter_events
+from .tokenizer import tokenize
+from .synthetic import write_script
+
+DEFAULT_SCRIPT = pathlib.Path(__file__).resolve().parent.parent / 'test.ass'
+
+
+def legacy_classify(lines: List[str]):
+    """ The per-line regex passes used by 'ASS' before the tokenizer, kept as the baseline. """
+    for line in lines:
+        line = line.strip()
+        if re.match(r'^[;|!]|^\s*$', line):
+            continue
+        if re.findall(r'^\[(.*)]$', line):
+            continue
+        re.split(r'\s*:\s*', line, maxsplit=1)
+
+
+def tokenizer_classify(lines: List[str]):
+    for _ in tokenize(lines):
+        pass
+
+
+def measure(function: Callable, argument, repeat: int) -> float:
+    """
+    Returns
+    -------
+    Out : float
+        The best wall time of 'repeat' runs in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(function: Callable, argument) -> int:
+    """
+    Returns
+    -------
+    Out : int
+        Peak bytes allocated by one run, traced with tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def count_events(path: pathlib.Path) -> int:
+    return sum(1 for _ in iter_events(path))
+
+
+def dump_to_null(ass: ASS):
+    with open(os.devnull, 'w', encoding='utf-8') as file:
+        ass.dump(file)
+
+
+def legacy_paser():
+    """
+    Returns
+    -------
+    Out : type or None
+        'archive.ssa.Paser' when it can be imported.
+    """
+    try:
+        from archive.ssa import Paser
+    except Exception:
+        return None
+    return Paser
+
+
+def benchmark_synthetic(sizes: List[int], repeat: int, **kwargs):
+    """ Parse time, streaming time, peak memory and serialize time of generated scripts. """
+    paser = legacy_paser()
+    if paser is None:
+        print('archive.ssa.Paser cannot be imported, only ASS is measured')
+
+    print('{:<10}{:<22}{:>10}{:>14}{:>12}'.format('events', 'operation', 'seconds', 'lines/s', 'peak MiB'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = write_script(pathlib.Path(directory) / 'synthetic_{}.ass'.format(size), events=size, **kwargs)
+            runs = max(1, repeat if size <= 10000 else 1)
+            ass = ASS(path)
+
+            operations = [
+                ('ASS parse', ASS, path),
+                ('iter_events stream', count_events, path),
+                ('ASS serialize', dump_to_null, ass)
+            ]
+            if paser is not None:
+                operations.append(('Paser parse', paser, str(path)))
+
+            for label, function, argument in operations:
+                seconds = measure(function, argument, runs)
+                peak = peak_memory(function, argument)
+                print('{:<10}{:<22}{:>10.3f}{:>14.0f}{:>12.1f}'.format(
+                    size, label, seconds, size / seconds, peak / (1 << 20)
+                ))
+            del ass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SSA/ASS tokenizer, parser and serializer.')
+    parser.add_argument('path', nargs='?', default=str(DEFAULT_SCRIPT))
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--synthetic', help='comma separated event counts of generated scripts, e.g. 10000,100000')
+    parser.add_argument('--styles', type=int, default=20)
+    parser.add_argument('--newline', choices=('lf', 'crlf'), default='lf')
+    parser.add_argument('--no-tags', action='store_true')
+    parser.add_argument('--no-cjk', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        benchmark_synthetic(
+            [int(size) for size in args.synthetic.split(',')], min(args.repeat, 5),
+            styles=args.styles, tags=not args.no_tags, cjk=not args.no_cjk,
+            newline='\r\n' if args.newline == 'crlf' else '\n', seed=args.seed
+        )
+        return
+
+    content = pathlib.Path(args.path).read_text(encoding='utf-8-sig')
+    lines = content.splitlines()
+
+    for label, function, argument in (
+            ('legacy regex classify', legacy_classify, lines),
+            ('tokenizer classify', tokenizer_classify, lines),
+            ('ASS full parse', ASS, content),
+            ('ASS serialize', ASS.to_text, ASS(content))
+    ):
+        seconds = measure(function, argument, args.repeat)
+        print('{:<24}{:>12.0f} lines/s'.format(label, len(lines) / seconds))
+
+
+if __name__ == '__main__':
+    main()
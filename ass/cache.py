@@ -0,0 +1,134 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Opt-in on-disk cache of parsed scripts.
+# Entries are pickles named after (path, size, mtime, encoding), so a changed file simply misses
+# and its stale entry ages out of the LRU.
+
+from typing import Optional, Union
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+from . import ASS
+
+CACHE_VERSION = 5
+
+
+def default_directory() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return pathlib.Path(base) / 'psub'
+
+
+class ParseCache:
+    """
+    Parameters
+    ----------
+    directory : str or Path, optional
+        Where entries are stored, '$XDG_CACHE_HOME/psub' by default.
+    max_bytes : int
+        Least recently used entries are removed once the directory grows beyond it.
+    """
+
+    def __init__(
+            self,
+            directory: Union[str, pathlib.Path, None] = None,
+            max_bytes: int = 256 << 20
+    ):
+        self.directory = pathlib.Path(directory) if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def entry_path(self, path: Union[str, pathlib.Path], encoding: str) -> pathlib.Path:
+        stat = os.stat(path)
+        key = '\0'.join((
+            str(CACHE_VERSION), os.path.abspath(path), str(stat.st_size), str(stat.st_mtime_ns), encoding
+        ))
+        return self.directory / (hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest() + '.pickle')
+
+    def get(self, path: Union[str, pathlib.Path], encoding: str = 'utf-8-sig') -> Optional[ASS]:
+        """
+        Returns
+        -------
+        Out : ASS or None
+            The cached script, None when missing, stale or unreadable.
+        """
+        return self.__read(self.entry_path(path, encoding))
+
+    def put(self, path: Union[str, pathlib.Path], ass: ASS, encoding: str = 'utf-8-sig'):
+        self.__write(self.entry_path(path, encoding), ass)
+
+    def load(self, path: Union[str, pathlib.Path], encoding: str = 'utf-8-sig') -> ASS:
+        """
+        Returns
+        -------
+        Out : ASS
+            The cached script, parsed and stored first on a miss.
+        """
+        # the key is taken before parsing, so a file changed meanwhile is stored under its old key and misses next time
+        entry = self.entry_path(path, encoding)
+        ass = self.__read(entry)
+        if ass is None:
+            ass = ASS(pathlib.Path(path), encoding)
+            self.__write(entry, ass)
+        return ass
+
+    def __read(self, entry: pathlib.Path) -> Optional[ASS]:
+        try:
+            with open(entry, 'rb') as file:
+                ass = pickle.load(file)
+            if not isinstance(ass, ASS):
+                raise TypeError('Not a parsed script')
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # a truncated or corrupt pickle may raise about anything
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+            return None
+
+        os.utime(entry)
+        return ass
+
+    def __write(self, entry: pathlib.Path, ass: ASS):
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump(ass, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, entry)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
+
+    def evict(self):
+        """ Remove least recently used entries until the cache fits in 'max_bytes'. """
+        entries = []
+        total = 0
+        for entry in self.directory.glob('*.pickle'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for entry in self.directory.glob('*.pickle'):
+            entry.unlink()
@@ -0,0 +1,92 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Encoding detection for scripts given as bytes, by BOM and by a bounded sniff of the first bytes.
+# Only the encodings found in subtitle archives are told apart: UTF-8/16/32, GBK, Big5 and Shift-JIS.
+
+from typing import Union
+import codecs
+import re
+
+AUTO = 'auto'
+
+SNIFF_SIZE = 64 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+)
+
+# Windows code pages, supersets of GBK, Big5 and Shift-JIS as written by subtitle editors on Windows
+_CANDIDATES = ('gbk', 'cp950', 'cp932')
+
+# Characters frequent in text of each candidate and rare in the mojibake of the others:
+# the most common hanzi in simplified and traditional forms, and kana
+_FREQUENT = {
+    'gbk': frozenset('的一是不了在人有我他这个们中来上大为和国地到以说时要就出会可也你对生能而子那得于着下'
+                     '自之年过发后作里用道行所然家种事成方多经么去法学如都同现当没动面起看定天分还进好小'),
+    'cp950': frozenset('的一是不了在人有我他這個們中來上大為和國地到以說時要就出會可也你對生能而子那得於著下'
+                       '自之年過發後作裡用道行所然家種事成方多經麼去法學如都同現當沒動面起看定天分還進好小'),
+    'cp932': frozenset(chr(code) for code in range(0x3041, 0x30FB))
+}
+
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+
+def _score(head: bytes, encoding: str) -> int:
+    """ Frequent characters in 'head' decoded with 'encoding', -1 when it does not decode. """
+    try:
+        # not final: the sniffed bytes may end in the middle of a character
+        text = codecs.getincrementaldecoder(encoding)('strict').decode(head, False)
+    except UnicodeDecodeError:
+        return -1
+    frequent = _FREQUENT[encoding]
+    return sum(1 for char in text if char in frequent)
+
+
+def detect_encoding(head: Union[bytes, bytearray, memoryview]) -> str:
+    """
+    Parameters
+    ----------
+    head : bytes
+        The first bytes of a script, 'SNIFF_SIZE' are enough.
+
+    Returns
+    -------
+    Out : str
+        A codec name: from the BOM, then UTF-16 without BOM by its zero bytes, UTF-8 when the head
+        is valid UTF-8 (as is plain ASCII), otherwise the best of GBK, Big5 and Shift-JIS.
+    """
+    head = bytes(head[:SNIFF_SIZE])
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    if b'\x00' in head:
+        even_zeros = head[0::2].count(0)
+        odd_zeros = head[1::2].count(0)
+        return 'utf-16-be' if even_zeros > odd_zeros else 'utf-16-le'
+
+    match = _NON_ASCII.search(head)
+    if match is None:
+        return 'utf-8'
+    # the first non-ASCII byte always starts a character, sniff from there
+    head = head[match.start():]
+    try:
+        codecs.getincrementaldecoder('utf-8')('strict').decode(head, False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    best, best_score = _CANDIDATES[0], -1
+    for encoding in _CANDIDATES:
+        score = _score(head, encoding)
+        if score > best_score:
+            best, best_score = encoding, score
+    return best
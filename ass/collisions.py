@@ -0,0 +1,110 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Quality check for lines shown at the same time in the same place on screen.
+# Events are grouped by where the renderer puts them, then every group is swept once by time,
+# so the pass is O(n log n + k) instead of comparing every pair.
+
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+from operator import attrgetter
+from .records import Style, Event, Dialogue
+from .resolve import StyleResolver
+from .interval import sweep_overlaps
+from .tags import iter_tags
+
+# Legacy '\a' alignment -> numpad '\an' alignment
+_LEGACY_ALIGNMENT = {1: 1, 2: 2, 3: 3, 5: 7, 6: 8, 7: 9, 9: 4, 10: 5, 11: 6}
+
+
+class ScreenPosition(NamedTuple):
+    layer: int
+    alignment: int
+    margin_l: int
+    margin_r: int
+    margin_v: int
+
+
+class Collision(NamedTuple):
+    position: ScreenPosition
+    first: Event
+    second: Event
+
+
+def screen_position(event: Event, resolver: StyleResolver) -> Optional[ScreenPosition]:
+    """
+    Returns
+    -------
+    Out : ScreenPosition or None
+        Layer, alignment (the first '\\an' or '\\a' overrides the style) and margins (non zero event margins
+        override the style) of 'event', None when '\\pos' or '\\move' places it explicitly.
+    """
+    style = resolver.base_style(event.style)
+    alignment = None
+    text = event.text
+    # only parse the tags of lines that may hold one of the tags read here
+    if '\\pos' in text or '\\move' in text or '\\a' in text:
+        for name, args in iter_tags(event.tokens):
+            if name == 'pos' or name == 'move':
+                return None
+            # as in renderers, the first alignment tag of a line wins
+            if alignment is not None:
+                continue
+            try:
+                if name == 'an':
+                    alignment = int(args[0])
+                elif name == 'a':
+                    alignment = _LEGACY_ALIGNMENT.get(int(args[0]), style.alignment)
+            except ValueError:
+                continue
+    if alignment is None:
+        alignment = style.alignment
+
+    return ScreenPosition(
+        event.layer, alignment,
+        event.margin_l or style.margin_l, event.margin_r or style.margin_r, event.margin_v or style.margin_v
+    )
+
+
+def find_collisions(
+        events: Sequence[Event],
+        styles: Mapping[str, Style],
+        include_comments: bool = False
+) -> Iterator[Collision]:
+    """
+    Find events shown at the same time at the same screen position.
+
+    Parameters
+    ----------
+    events : sequence
+        Events in any order.
+    styles : dict
+        Style name -> Style, used for the alignment and margins the events do not override.
+    include_comments : bool
+        Also check events that are not Dialogue, which renderers do not show.
+
+    Returns
+    -------
+    Out : iterator
+        A Collision for every pair of overlapping events in the same group, grouped by position,
+        the earlier start first within a pair. Explicitly positioned events are never reported.
+    """
+    resolver = StyleResolver(styles)
+    groups: Dict[ScreenPosition, List[Event]] = {}
+    for event in events:
+        if not include_comments and not isinstance(event, Dialogue):
+            continue
+        position = screen_position(event, resolver)
+        if position is not None:
+            groups.setdefault(position, []).append(event)
+
+    by_start = attrgetter('start')
+    for position, group in groups.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=by_start)
+        for first, second in sweep_overlaps(group):
+            yield Collision(position, first, second)
+
@@ -0,0 +1,114 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Colors are stored as packed 32-bit ints laid out like the file text '&HAABBGGRR',
+# so that parsing is a single int(..., 16) and formatting a single '%08X'.
+# Alpha 0x00 is opaque and 0xFF is transparent, as in SSA.
+
+from typing import Iterable, Tuple
+from array import array
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def parse_color(text: str) -> int:
+    """
+    Parameters
+    ----------
+    text : str
+        '&HAABBGGRR', '&HBBGGRR&' or the decimal form used by SSA v4 styles.
+        Repeated strings are answered from an LRU cache.
+
+    Returns
+    -------
+    Out : int
+        Packed 0xAABBGGRR.
+    """
+    text = text.strip().rstrip('&')
+    if text[:2] in ('&H', '&h'):
+        return int(text[2:], 16) & 0xFFFFFFFF
+    return int(text) & 0xFFFFFFFF
+
+
+def format_color(color: int) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        '&HAABBGGRR' as written in '[V4+ Styles]'.
+    """
+    return '&H%08X' % color
+
+
+def parse_colors(texts: Iterable[str]) -> array:
+    """
+    Returns
+    -------
+    Out : array
+        Packed colors of every text, as an unsigned 32-bit array.
+    """
+    return array('L', map(parse_color, texts))
+
+
+def format_colors(colors: Iterable[int]) -> list:
+    return list(map(format_color, colors))
+
+
+def parse_tag_color(text: str) -> int:
+    """
+    Parameters
+    ----------
+    text : str
+        Value of '\\c', '\\1c' ... '\\4c', e.g. '&H00FF00&'.
+
+    Returns
+    -------
+    Out : int
+        Packed 0x00BBGGRR.
+    """
+    return parse_color(text) & 0xFFFFFF
+
+
+def format_tag_color(color: int) -> str:
+    return '&H%06X&' % (color & 0xFFFFFF)
+
+
+def parse_tag_alpha(text: str) -> int:
+    """
+    Parameters
+    ----------
+    text : str
+        Value of '\\alpha', '\\1a' ... '\\4a', e.g. '&H80&'.
+
+    Returns
+    -------
+    Out : int
+        Alpha from 0x00 (opaque) to 0xFF.
+    """
+    return parse_color(text) & 0xFF
+
+
+def format_tag_alpha(alpha: int) -> str:
+    return '&H%02X&' % (alpha & 0xFF)
+
+
+def with_alpha(color: int, alpha: int) -> int:
+    """ Replace the alpha byte of a packed color. """
+    return (color & 0xFFFFFF) | ((alpha & 0xFF) << 24)
+
+
+def pack(red: int, green: int, blue: int, alpha: int = 0) -> int:
+    return (alpha & 0xFF) << 24 | (blue & 0xFF) << 16 | (green & 0xFF) << 8 | (red & 0xFF)
+
+
+def unpack(color: int) -> Tuple[int, int, int, int]:
+    """
+    Returns
+    -------
+    Out : tuple
+        (red, green, blue, alpha).
+    """
+    return color & 0xFF, color >> 8 & 0xFF, color >> 16 & 0xFF, color >> 24 & 0xFF
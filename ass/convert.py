@@ -0,0 +1,293 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Streaming conversion of events to SRT, WebVTT and TTML.
+# Usage: python -m ass.convert <directory | glob | file>... [--formats srt,vtt,ttml] [--window N] [--workers N]
+#
+# Events become cues of plain text: drawings are dropped, '\N' breaks the line and, with markup,
+# bold, italic and underline turned on by override tags become the tags of the target format.
+# What the style itself sets is left to the player's own default look.
+# Events with the same start and end are merged into one cue. Times stay integer centiseconds
+# until they are written as milliseconds.
+
+from typing import Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Union
+from functools import partial
+from xml.sax.saxutils import escape
+import argparse
+import heapq
+import os
+import pathlib
+from .errors import ASSFileError
+from .records import Style, Event, Dialogue
+from .resolve import StyleResolver
+from .tags import TEXT
+from .mapped import MappedASS
+from .writer import write_lines
+from .batch import parse_files
+
+FORMATS = ('srt', 'vtt', 'ttml')
+
+# Cues held back by 'convert_file', enough for scripts sorted by time as editors save them
+DEFAULT_WINDOW = 4096
+
+# Open and close tags of bold, italic and underline, by format
+_MARKUP = {
+    'srt': (('bold', '<b>', '</b>'), ('italic', '<i>', '</i>'), ('underline', '<u>', '</u>')),
+    'vtt': (('bold', '<b>', '</b>'), ('italic', '<i>', '</i>'), ('underline', '<u>', '</u>')),
+    'ttml': (
+        ('bold', '<span tts:fontWeight="bold">', '</span>'),
+        ('italic', '<span tts:fontStyle="italic">', '</span>'),
+        ('underline', '<span tts:textDecoration="underline">', '</span>')
+    )
+}
+
+_LINE_BREAKS = {'srt': '\n', 'vtt': '\n', 'ttml': '<br/>'}
+
+
+class OutOfOrderError(ValueError):
+    """ An event came after cues starting later had already been written, see 'iter_cues'. """
+
+
+class Cue(NamedTuple):
+    start: int
+    end: int
+    text: str
+
+
+def _clock(centiseconds: int, separator: str) -> str:
+    """ 'HH:MM:SS.mmm' with 'separator' before the milliseconds, negative times clamped to zero. """
+    second, centisecond = divmod(max(centiseconds, 0), 100)
+    minute, second = divmod(second, 60)
+    hour, minute = divmod(minute, 60)
+    return '%02d:%02d:%02d%s%03d' % (hour, minute, second, separator, centisecond * 10)
+
+
+def cue_text(event: Event, resolver: StyleResolver, target: str = 'srt', markup: bool = True) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        The visible text of 'event' for 'target', escaped for WebVTT and TTML,
+        with bold, italic and underline turned on by override tags as tags when 'markup' is set.
+    """
+    line_break = _LINE_BREAKS[target]
+    escaped = target != 'srt'
+    base = resolver.base_style(event.style)
+    tags = [tag for tag in _MARKUP[target] if not getattr(base, tag[0])] if markup else ()
+
+    parts, opened = [], ()
+    for kind, text, style in resolver.runs(event):
+        if kind != TEXT:
+            continue
+        if escaped:
+            text = escape(text)
+        text = text.replace('\\N', line_break).replace('\\n', ' ').replace('\\h', '\u00a0')
+
+        current = tuple(tag for tag in tags if getattr(style, tag[0]))
+        if current != opened:
+            # close everything and open again, so that tags always nest
+            parts.extend(close for _, _, close in reversed(opened))
+            parts.extend(open_tag for _, open_tag, _ in current)
+            opened = current
+        parts.append(text)
+    parts.extend(close for _, _, close in reversed(opened))
+    return ''.join(parts).strip()
+
+
+def iter_cues(
+        events: Iterable[Event],
+        styles: Optional[Mapping[str, Style]] = None,
+        target: str = 'srt',
+        markup: bool = True,
+        window: Optional[int] = None
+) -> Iterator[Cue]:
+    """
+    Turn events into cues in time order, merging events with the same start and end.
+
+    Parameters
+    ----------
+    events : iterable
+        Records in any order, e.g. 'ASS.events', 'stream.iter_events' or 'MappedASS.iter_events'.
+        Only Dialogue lines with visible text are kept.
+    styles : dict, optional
+        Style name -> Style, the base that override tags and '\\r' change.
+    window : int, optional
+        Keep at most this many cues pending. Memory is then constant and the output exact
+        as long as no event comes more than 'window' places after a later starting one,
+        as in scripts sorted by time, otherwise OutOfOrderError is raised.
+        By default every cue is kept until the end.
+
+    Returns
+    -------
+    Out : iterator
+        Cues with 'start' < 'end' and the texts of merged events on separate lines.
+    """
+    resolver = StyleResolver(styles if styles is not None else {})
+    line_break = _LINE_BREAKS[target]
+    pending = []
+    held = None
+    # (start, end) of the last cue taken off the heap
+    released = None
+
+    def release(cue: tuple) -> Iterator[Cue]:
+        nonlocal held
+        if held is not None and held[0] == cue[0] and held[1] == cue[1]:
+            held = (held[0], held[1], held[2], held[3] + line_break + cue[3])
+            return
+        if held is not None:
+            yield Cue(held[0], held[1], held[3])
+        held = cue
+
+    for order, event in enumerate(events):
+        if not isinstance(event, Dialogue) or event.end <= event.start:
+            continue
+        text = cue_text(event, resolver, target, markup)
+        if not text:
+            continue
+        if released is not None and (event.start, event.end) < released:
+            raise OutOfOrderError('Event {} is more than {} cues out of order'.format(order, window))
+        heapq.heappush(pending, (event.start, event.end, order, text))
+        if window is not None and len(pending) > window:
+            cue = heapq.heappop(pending)
+            released = cue[:2]
+            yield from release(cue)
+
+    while pending:
+        yield from release(heapq.heappop(pending))
+    if held is not None:
+        yield Cue(held[0], held[1], held[3])
+
+
+def iter_srt(cues: Iterable[Cue]) -> Iterator[str]:
+    for index, (start, end, text) in enumerate(cues, 1):
+        yield '{}\n{} --> {}\n{}\n\n'.format(index, _clock(start, ','), _clock(end, ','), text)
+
+
+def iter_vtt(cues: Iterable[Cue]) -> Iterator[str]:
+    yield 'WEBVTT\n\n'
+    for start, end, text in cues:
+        yield '{} --> {}\n{}\n\n'.format(_clock(start, '.'), _clock(end, '.'), text)
+
+
+def iter_ttml(cues: Iterable[Cue], language: str = '') -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<tt xmlns="http://www.w3.org/ns/ttml" xmlns:tts="http://www.w3.org/ns/ttml#styling"{}>\n'.format(
+        ' xml:lang="{}"'.format(escape(language)) if language else ''
+    )
+    yield '<body>\n<div>\n'
+    for start, end, text in cues:
+        yield '<p begin="{}" end="{}">{}</p>\n'.format(_clock(start, '.'), _clock(end, '.'), text)
+    yield '</div>\n</body>\n</tt>\n'
+
+
+_WRITERS = {'srt': iter_srt, 'vtt': iter_vtt, 'ttml': iter_ttml}
+
+
+def iter_subtitles(
+        events: Iterable[Event],
+        target: str,
+        styles: Optional[Mapping[str, Style]] = None,
+        markup: bool = True,
+        window: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Returns
+    -------
+    Out : iterator
+        Chunks of the 'srt', 'vtt' or 'ttml' file of 'events', see 'iter_cues'.
+    """
+    if target not in _WRITERS:
+        raise ValueError('Unknown subtitle format: {!r}'.format(target))
+    return _WRITERS[target](iter_cues(events, styles, target, markup, window))
+
+
+def convert_file(
+        path: Union[str, pathlib.Path],
+        encoding: str = 'utf-8-sig',
+        formats: Sequence[str] = ('srt', 'vtt'),
+        directory: Union[str, pathlib.Path, None] = None,
+        markup: bool = True,
+        window: Optional[int] = DEFAULT_WINDOW
+) -> List[str]:
+    """
+    Write a script as each of 'formats' next to it, or into 'directory'.
+
+    The script is memory-mapped and its events decoded one by one, with at most 'window' cues pending,
+    see 'iter_cues'. A script too far out of order for 'window' is converted again keeping every cue,
+    as with 'window' None.
+    Being a top level function taking (path, encoding), it can be given to 'batch.parse_files'
+    to convert a season in a process pool.
+
+    Returns
+    -------
+    Out : list
+        Paths written.
+    """
+    path = pathlib.Path(path)
+    directory = path.parent if directory is None else pathlib.Path(directory)
+    written = []
+    try:
+        source = MappedASS(path, encoding)
+    except ASSFileError:
+        # UTF-16 and UTF-32 cannot be mapped
+        from . import ASS
+        source = ASS(path, encoding)
+
+    def write(output: pathlib.Path, target: str, target_window: Optional[int]):
+        with open(output, 'w', encoding='utf-8', newline='\n') as file:
+            events = source.iter_events() if isinstance(source, MappedASS) else source.events
+            write_lines(iter_subtitles(events, target, source.styles, markup, target_window), file)
+
+    try:
+        for target in formats:
+            output = directory / (path.stem + '.' + target)
+            try:
+                write(output, target, window)
+            except OutOfOrderError:
+                write(output, target, None)
+            written.append(str(output))
+    finally:
+        if isinstance(source, MappedASS):
+            source.close()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert SSA/ASS scripts to SRT, WebVTT and TTML.')
+    parser.add_argument('sources', nargs='+', help='directories, glob patterns or files')
+    parser.add_argument('--formats', default='srt,vtt', help='comma separated, out of ' + ', '.join(FORMATS))
+    parser.add_argument('--output', default=None, help='directory of the output, by default next to each script')
+    parser.add_argument('--no-markup', action='store_true', help='drop bold, italic and underline')
+    parser.add_argument(
+        '--window', type=int, default=DEFAULT_WINDOW,
+        help='cues held back to put them in time order, 0 to hold all of them'
+    )
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--encoding', default='utf-8-sig')
+    args = parser.parse_args(argv)
+
+    formats = tuple(name.strip() for name in args.formats.split(',') if name.strip())
+    for name in formats:
+        if name not in FORMATS:
+            parser.error('unknown format: {}'.format(name))
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+
+    function = partial(
+        convert_file, formats=formats, directory=args.output, markup=not args.no_markup, window=args.window or None
+    )
+    failed = 0
+    for result in parse_files(args.sources, function, args.encoding, args.workers):
+        if isinstance(result, list):
+            print('\n'.join(result))
+        else:
+            failed += 1
+            print('{}\tERROR\t{}'.format(result.path, result.error))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
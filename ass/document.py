@@ -0,0 +1,346 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# An editable script that keeps its source lines and re-parses only the lines an edit touches.
+
+from typing import Iterator, Sequence, TextIO, Tuple, Union
+from bisect import bisect_right
+import pathlib
+import _io
+from . import ASS
+from .stream import open_lines
+from .tokenizer import classify, normalize_name, parse_format, SECTION, FORMAT, ENTRY, UNKNOWN
+from .attachments import AttachmentReader, NamePrefixes, read_attachments
+from .records import Style, EventTypes, DefaultStyleFormat, DefaultEventFormat
+from .writer import write_lines
+
+# Kind of every source line, kept in a bytearray so that counting events before a line runs in C
+OTHER_LINE = 0
+EVENT_LINE = 1
+STYLE_LINE = 2
+INFO_LINE = 3
+FORMAT_LINE = 4
+SECTION_LINE = 5
+NONSTANDARD_LINE = 6
+
+_EVENT = bytes([EVENT_LINE])
+_FORMAT = bytes([FORMAT_LINE])
+
+_KNOWN_SECTIONS = ('scriptinfo', 'v4+styles', 'v4styles', 'events')
+
+
+def _code_points(line: str, units: int) -> int:
+    """ Index in 'line' of the position 'units' UTF-16 code units from its start. """
+    if line.isascii():
+        return units
+    count = 0
+    for index, char in enumerate(line):
+        if count >= units:
+            return index
+        count += 2 if char > '\uffff' else 1
+    return len(line)
+
+
+class Document(ASS):
+    """
+    A parsed script that can be edited by line ranges.
+
+    'lines' holds the source text, and for every line its kind and, for styles and info, its record are kept,
+    so an edit detaches the records of the replaced lines, decodes only the new ones and splices
+    them into 'events', 'styles' and 'script_info' in place.
+    An edit that adds or removes a section header re-parses the whole document.
+    """
+
+    def __init__(
+            self,
+            ass: Union[str, bytes, pathlib.Path, _io.TextIOWrapper, _io.BufferedReader, None] = None,
+            encoding: str = 'utf-8-sig'
+    ):
+        super().__init__()
+        self.lines = []
+        if ass is not None:
+            with open_lines(ass, encoding) as ass_lines:
+                self.lines = [line.rstrip('\r\n') for line in ass_lines]
+        self.__rebuild()
+
+    def __rebuild(self):
+        self.script_info.clear()
+        self.styles.clear()
+        self.events.clear()
+        self.nonstandard_sections.clear()
+        self.fonts = []
+        self.graphics = []
+        self.style_format = DefaultStyleFormat
+        self.event_format = DefaultEventFormat
+        self.invalidate_index()
+        self.invalidate_styles()
+
+        self.__kinds = bytearray(len(self.lines))
+        self.__records = [None] * len(self.lines)
+        self.__header_lines = []
+        self.__header_names = []
+        attachments = None
+        for index, line in enumerate(self.lines):
+            # data lines of embedded files may look like a section header
+            if attachments is not None and attachments.feed(line):
+                continue
+            kind, key, _ = classify(line)
+            if kind == SECTION:
+                self.__kinds[index] = SECTION_LINE
+                self.__header_lines.append(index)
+                self.__header_names.append(key)
+                section_key = normalize_name(key)
+                attachments = AttachmentReader(section_key) if section_key in NamePrefixes else None
+
+        for section in range(len(self.__header_lines)):
+            start, end = self.__section_range(section)
+            self.__attach(start, self.__decode(section, start, self.lines[start:end]))
+        self.__refresh()
+
+    def __section_range(self, section: int) -> Tuple[int, int]:
+        """ First and end line of the body of the section at 'section' in the header list. """
+        start = self.__header_lines[section] + 1
+        end = self.__header_lines[section + 1] if section + 1 < len(self.__header_lines) else len(self.lines)
+        return start, end
+
+    def __section_of(self, line: int) -> int:
+        """ Position in the header list of the section holding 'line', -1 before the first header. """
+        return bisect_right(self.__header_lines, line) - 1
+
+    def __section_key(self, section: int) -> str:
+        return normalize_name(self.__header_names[section]) if section >= 0 else ''
+
+    def __row_format(self, section: int, line: int, default: tuple) -> tuple:
+        """ The last 'Format:' above 'line' in its section. """
+        start = self.__header_lines[section] + 1
+        position = self.__kinds.rfind(_FORMAT, start, line)
+        if position < 0:
+            return default
+        return parse_format(classify(self.lines[position])[2])
+
+    def __decode(self, section: int, start: int, lines: Sequence[str]) -> list:
+        """
+        Decode 'lines', to be placed from line 'start' in the body of 'section', without changing the document,
+        so that a row that does not decode leaves it as it was.
+
+        Returns
+        -------
+        Out : list
+            (line kind, record, value) per line: the Event or Style, or the key and value of an info line,
+            or the parsed columns of a 'Format:' line.
+        """
+        section_key = self.__section_key(section)
+        decoded = []
+        if section_key in _KNOWN_SECTIONS[1:]:
+            is_events = section_key == 'events'
+            row_format = self.__row_format(section, start, DefaultEventFormat if is_events else DefaultStyleFormat)
+            for line in lines:
+                kind, key, value = classify(line)
+                if kind == FORMAT:
+                    row_format = parse_format(value)
+                    decoded.append((FORMAT_LINE, None, row_format))
+                elif kind == ENTRY and is_events and key in EventTypes:
+                    decoded.append((EVENT_LINE, EventTypes[key](value, row_format), None))
+                elif kind == ENTRY and not is_events and key == 'Style':
+                    decoded.append((STYLE_LINE, Style(value, row_format), None))
+                else:
+                    decoded.append((OTHER_LINE, None, None))
+
+        elif section_key == 'scriptinfo':
+            for line in lines:
+                kind, key, value = classify(line)
+                if kind == ENTRY or kind == FORMAT:
+                    decoded.append((INFO_LINE, key, value))
+                else:
+                    decoded.append((OTHER_LINE, None, None))
+
+        else:
+            kind = NONSTANDARD_LINE if section >= 0 else OTHER_LINE
+            decoded = [(kind, None, None)] * len(lines)
+        return decoded
+
+    def __attach(self, start: int, decoded: list):
+        """ Add the records of lines [start, start + len(decoded)) of one section, from '__decode'. """
+        section = self.__section_of(start)
+        section_key = self.__section_key(section)
+        kinds, records = self.__kinds, self.__records
+        events = []
+        for index, (kind, record, value) in enumerate(decoded, start):
+            kinds[index], records[index] = kind, None
+            if kind == EVENT_LINE:
+                events.append(record)
+            elif kind == STYLE_LINE:
+                records[index] = record
+            elif kind == INFO_LINE:
+                records[index] = record
+            elif kind == FORMAT_LINE:
+                if section_key == 'events':
+                    self.event_format = value
+                else:
+                    self.style_format = value
+
+        if events:
+            position = kinds.count(_EVENT, 0, start)
+            self.events[position:position] = events
+        if section_key in NamePrefixes:
+            # data lines are read raw, the whole section again as attachments span many lines
+            setattr(self, section_key, read_attachments(section_key, self.lines[slice(*self.__section_range(section))]))
+        elif section >= 0 and section_key not in _KNOWN_SECTIONS:
+            section_name = self.__header_names[section]
+            self.nonstandard_sections[section_name] = [
+                value if kind == UNKNOWN else '{}: {}'.format(key, value)
+                for kind, key, value in map(classify, self.lines[slice(*self.__section_range(section))])
+                if kind == ENTRY or kind == FORMAT or kind == UNKNOWN
+            ]
+
+    def __lines_of(self, kind: int) -> Iterator[int]:
+        kinds = self.__kinds
+        index = kinds.find(kind)
+        while index >= 0:
+            yield index
+            index = kinds.find(kind, index + 1)
+
+    def __refresh(self):
+        """
+        Styles, script info and formats from the lines, the last line winning as in a full parse.
+        These lines are few, and found in C.
+        """
+        records = self.__records
+        styles = {}
+        for index in self.__lines_of(STYLE_LINE):
+            styles[records[index].name] = records[index]
+        if styles != self.styles:
+            self.styles.clear()
+            self.styles.update(styles)
+            self.invalidate_styles()
+
+        script_info = {}
+        for index in self.__lines_of(INFO_LINE):
+            script_info[records[index]] = classify(self.lines[index])[2]
+        if script_info != self.script_info:
+            self.script_info.clear()
+            self.script_info.update(script_info)
+
+        self.style_format, self.event_format = DefaultStyleFormat, DefaultEventFormat
+        for index in self.__lines_of(FORMAT_LINE):
+            row_format = parse_format(classify(self.lines[index])[2])
+            if self.__section_key(self.__section_of(index)) == 'events':
+                self.event_format = row_format
+            else:
+                self.style_format = row_format
+
+    def __detach(self, start: int, end: int):
+        """ Remove the events of lines [start, end), styles and script info follow in '__refresh'. """
+        kinds = self.__kinds
+        count = kinds.count(_EVENT, start, end)
+        if count:
+            position = kinds.count(_EVENT, 0, start)
+            del self.events[position:position + count]
+
+    def replace_lines(self, start: int, end: int, new_lines: Sequence[str]):
+        """
+        Replace lines [start, end) with 'new_lines' and re-parse only what changed.
+
+        Lines inserted at a section header ('start' == 'end') go to the end of the section above it.
+        When a 'Format:' line is added, removed or edited, the rows of that section alone
+        are decoded again with the new column mapping.
+        A row that does not decode raises ASSFileError or ValueError and leaves the document unchanged.
+        """
+        new_lines = [line.rstrip('\r\n') for line in new_lines]
+        new_tokens = [classify(line) for line in new_lines]
+        # an insertion belongs to the section of the line above it
+        section = self.__section_of(start if start < end else start - 1)
+        if (
+                SECTION_LINE in self.__kinds[start:end] or any(kind == SECTION for kind, _, _ in new_tokens)
+                or self.__section_key(section) in NamePrefixes
+        ):
+            # section bounds inside '[Fonts]' and '[Graphics]' depend on the data lines
+            old_lines = self.lines[start:end]
+            self.lines[start:end] = new_lines
+            try:
+                self.__rebuild()
+            except BaseException:
+                self.lines[start:start + len(new_lines)] = old_lines
+                self.__rebuild()
+                raise
+            return
+
+        detach_start, detach_end = start, end
+        if FORMAT_LINE in self.__kinds[start:end] or any(kind == FORMAT for kind, _, _ in new_tokens):
+            if section >= 0:
+                detach_start, detach_end = self.__section_range(section)
+        decoded = self.__decode(
+            section, detach_start, self.lines[detach_start:start] + new_lines + self.lines[end:detach_end]
+        )
+
+        delta = len(new_lines) - (end - start)
+        self.__detach(detach_start, detach_end)
+        self.lines[start:end] = new_lines
+        self.__kinds[start:end] = bytes(len(new_lines))
+        self.__records[start:end] = [None] * len(new_lines)
+        for position in range(section + 1, len(self.__header_lines)):
+            self.__header_lines[position] += delta
+
+        self.__attach(detach_start, decoded)
+        self.__refresh()
+        self.invalidate_index()
+
+    def apply_edit(self, start_line: int, start_character: int, end_line: int, end_character: int, text: str):
+        """
+        Apply an LSP text edit: replace the text between two (line, character) positions.
+        Characters are counted in UTF-16 code units, as in LSP, so emoji and other characters
+        outside the BMP count twice.
+        """
+        prefix = self.lines[start_line][:_code_points(self.lines[start_line], start_character)] \
+            if start_line < len(self.lines) else ''
+        suffix = self.lines[end_line][_code_points(self.lines[end_line], end_character):] \
+            if end_line < len(self.lines) else ''
+        self.replace_lines(
+            start_line, min(end_line + 1, len(self.lines)), (prefix + text + suffix).split('\n')
+        )
+
+    def line_record(self, line: int):
+        """
+        Returns
+        -------
+        Out : Event, Style, str or None
+            The record parsed from 'line', the key for a '[Script Info]' line.
+        """
+        if self.__kinds[line] == EVENT_LINE:
+            # events are found by position, so 'own_event' may replace them without bookkeeping here
+            return self.events[self.__kinds.count(_EVENT, 0, line)]
+        return self.__records[line]
+
+    def clone(self) -> 'Document':
+        clone = super().clone()
+        clone.lines = list(self.lines)
+        clone.__kinds = bytearray(self.__kinds)
+        clone.__records = list(self.__records)
+        clone.__header_lines = list(self.__header_lines)
+        clone.__header_names = list(self.__header_names)
+        return clone
+
+    def own_style(self, name: str) -> Style:
+        style = self.styles[name]
+        owned = super().own_style(name)
+        if owned is not style and style in self.__records:
+            self.__records[self.__records.index(style)] = owned
+        return owned
+
+    def dump(
+            self,
+            file: Union[str, pathlib.Path, TextIO],
+            encoding: str = 'utf-8-sig'
+    ) -> int:
+        """
+        Write 'lines', the text as edited. Records changed in place are not written back,
+        edit a Document with 'replace_lines' and 'apply_edit'.
+        """
+        lines = (line + '\n' for line in self.lines)
+        if isinstance(file, (str, pathlib.Path)):
+            with open(file, 'w', encoding=encoding) as file:
+                return write_lines(lines, file)
+        return write_lines(lines, file)
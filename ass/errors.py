@@ -0,0 +1,9 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+
+class ASSFileError(Exception):
+    pass
@@ -0,0 +1,148 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Centered interval tree over event times.
+# An event is visible on [start, end), so zero-length events are never visible at a point.
+
+from typing import Iterator, List, Sequence, Tuple
+from operator import attrgetter
+import heapq
+from .records import Event
+
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, by_start, left, right):
+        self.center = center
+        self.by_start = by_start
+        self.by_end = sorted(by_start, key=attrgetter('end'), reverse=True)
+        self.left = left
+        self.right = right
+
+
+def _build(events: List[Event]):
+    """ 'events' must be sorted by start, with no end before its start. """
+    if not events:
+        return None
+
+    center = events[len(events) // 2].start
+    left, middle, right = [], [], []
+    for event in events:
+        if event.end < center:
+            left.append(event)
+        elif event.start > center:
+            right.append(event)
+        else:
+            middle.append(event)
+
+    return _Node(center, middle, _build(left), _build(right))
+
+
+def sweep_overlaps(events: Sequence[Event]) -> Iterator[Tuple[Event, Event]]:
+    """
+    Sweep over 'events', which must be sorted by start, keeping the visible ones in a heap by end.
+    Runs in O(n log n + k) for k pairs.
+
+    Returns
+    -------
+    Out : iterator
+        Every pair of events whose [start, end) ranges intersect, earlier start first.
+    """
+    active = []
+    for order, event in enumerate(events):
+        if event.end <= event.start:
+            continue
+        while active and active[0][0] <= event.start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, event
+        heapq.heappush(active, (event.end, order, event))
+
+
+class IntervalIndex:
+    """
+    Answer time queries over events in O(log n + k).
+
+    The index is a snapshot: rebuild it after times are changed. Events ending before they start
+    are never visible and are left out of the tree, though kept in 'events'.
+    """
+
+    def __init__(self, events: Sequence[Event]):
+        self.events = sorted(events, key=attrgetter('start'))
+        self.__root = _build([event for event in self.events if event.end >= event.start])
+
+    def __len__(self):
+        return len(self.events)
+
+    def events_at(self, time: int) -> List[Event]:
+        """
+        Returns
+        -------
+        Out : list
+            Events with start <= time < end, in no particular order.
+        """
+        found = []
+        node = self.__root
+        while node is not None:
+            if time < node.center:
+                for event in node.by_start:
+                    if event.start > time:
+                        break
+                    found.append(event)
+                node = node.left
+            else:
+                for event in node.by_end:
+                    if event.end <= time:
+                        break
+                    found.append(event)
+                node = node.right if time > node.center else None
+        return found
+
+    def events_between(self, start: int, end: int) -> List[Event]:
+        """
+        Returns
+        -------
+        Out : list
+            Events overlapping [start, end), i.e. event.start < end and event.end > start,
+            in no particular order.
+        """
+        found = []
+        if start >= end:
+            return found
+
+        nodes = [self.__root]
+        while nodes:
+            node = nodes.pop()
+            if node is None:
+                continue
+
+            if end <= node.center:
+                for event in node.by_start:
+                    if event.start >= end:
+                        break
+                    found.append(event)
+                nodes.append(node.left)
+            elif start >= node.center:
+                for event in node.by_end:
+                    if event.end <= start:
+                        break
+                    found.append(event)
+                nodes.append(node.right)
+            else:
+                found.extend(node.by_start)
+                nodes.append(node.left)
+                nodes.append(node.right)
+        return found
+
+    def overlaps(self) -> Iterator[Tuple[Event, Event]]:
+        """
+        Returns
+        -------
+        Out : iterator
+            Every pair of events whose [start, end) ranges intersect, see 'sweep_overlaps'.
+        """
+        return sweep_overlaps(self.events)
@@ -0,0 +1,243 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Karaoke syllables of '\k', '\K', '\kf' and '\ko' tags.
+#
+# A line is split into a preamble and syllables. Every syllable keeps the tags around its karaoke tag
+# and the tokens up to the next one, so that its tokens rebuild the exact text, while the durations
+# are held in one integer array. Events cache their Karaoke until their text changes.
+
+from typing import Iterable, List, NamedTuple, Sequence, Tuple
+from array import array
+import math
+from .tags import TEXT, BLOCK, TAG, Token
+
+KaraokeTags = ('k', 'K', 'kf', 'ko')
+
+
+class Syllable(NamedTuple):
+    start: int
+    end: int
+    kind: str
+    text: str
+
+
+class _Part(NamedTuple):
+    # tags of the block before and after the karaoke tag
+    before: tuple
+    after: tuple
+    # tokens up to the next karaoke tag
+    tokens: tuple
+    # the karaoke tag shares its block with the previous one
+    same_block: bool
+
+
+def _plain(tokens: Iterable[Token]) -> str:
+    return ''.join([value for kind, _, value in tokens if kind == TEXT])
+
+
+def _duration(args: tuple) -> int:
+    try:
+        return max(int(float(args[0])), 0) if args and args[0] else 0
+    except ValueError:
+        return 0
+
+
+class Karaoke:
+    """
+    The syllables of one line.
+
+    Durations are centiseconds in an array('l'). Karaoke objects are not changed in place,
+    the bulk operations return new ones, to be assigned to 'Event.karaoke'.
+    """
+    __slots__ = ('preamble', 'kinds', 'durations', 'texts', '__parts')
+
+    def __init__(self, preamble: tuple, kinds: tuple, durations: array, parts: tuple):
+        self.preamble = preamble
+        self.kinds = kinds
+        self.durations = durations
+        self.__parts = parts
+        self.texts = tuple(_plain(part.tokens) for part in parts)
+
+    def __len__(self):
+        return len(self.durations)
+
+    def __repr__(self):
+        return '<Karaoke {}>'.format(' '.join('{}{}'.format(*pair) for pair in zip(self.durations, self.texts)))
+
+    @property
+    def duration(self) -> int:
+        return sum(self.durations)
+
+    def offsets(self) -> array:
+        """ Start of every syllable relative to the start of the line, and the end of the last one. """
+        offsets = array('l', [0])
+        total = 0
+        for duration in self.durations:
+            total += duration
+            offsets.append(total)
+        return offsets
+
+    def syllables(self, start: int = 0) -> List[Syllable]:
+        """
+        Returns
+        -------
+        Out : list
+            Absolute (start, end, kind, plain text) of every syllable of a line starting at 'start'.
+        """
+        offsets = self.offsets()
+        return [
+            Syllable(start + offsets[index], start + offsets[index + 1], kind, text)
+            for index, (kind, text) in enumerate(zip(self.kinds, self.texts))
+        ]
+
+    def with_durations(self, durations: Iterable[int]) -> 'Karaoke':
+        durations = array('l', durations)
+        if len(durations) != len(self.durations):
+            raise ValueError('Expect {} durations but got {}'.format(len(self.durations), len(durations)))
+        return Karaoke(self.preamble, self.kinds, durations, self.__parts)
+
+    def scaled(self, factor: float) -> 'Karaoke':
+        """
+        Every duration times 'factor'. The syllable boundaries are rounded rather than the durations,
+        so that the total is rounded only once and no error adds up over the line.
+        """
+        offsets = self.offsets()
+        bounds = [math.floor(offset * factor + 0.5) for offset in offsets]
+        return self.with_durations(bounds[index + 1] - bounds[index] for index in range(len(self.durations)))
+
+    def split(self, index: int, pieces: Sequence[str]) -> 'Karaoke':
+        """
+        Split the syllable at 'index' into 'pieces', whose concatenation must be its text,
+        sharing its duration in proportion to their lengths. Only plain text syllables can be split.
+        """
+        part = self.__parts[index]
+        if ''.join(pieces) != self.texts[index] or any(kind != TEXT for kind, _, _ in part.tokens):
+            raise ValueError('{!r} does not split the plain syllable {!r}'.format(pieces, self.texts[index]))
+
+        duration, length = self.durations[index], max(len(self.texts[index]), 1)
+        bounds, position = [0], 0
+        for piece in pieces:
+            position += len(piece)
+            bounds.append(duration * position // length)
+        bounds[-1] = duration
+
+        kind = self.kinds[index]
+        new_parts = tuple(
+            _Part(part.before if number == 0 else (), part.after if number == 0 else (),
+                  ((TEXT, '', piece),) if piece else (), part.same_block if number == 0 else False)
+            for number, piece in enumerate(pieces)
+        )
+        new_durations = [bounds[number + 1] - bounds[number] for number in range(len(pieces))]
+        return Karaoke(
+            self.preamble,
+            self.kinds[:index] + (kind,) * len(pieces) + self.kinds[index + 1:],
+            array('l', list(self.durations[:index]) + new_durations + list(self.durations[index + 1:])),
+            self.__parts[:index] + new_parts + self.__parts[index + 1:]
+        )
+
+    def to_tokens(self) -> Tuple[Token, ...]:
+        """ Tokens of the line with the karaoke tags written from 'kinds' and 'durations'. """
+        tokens = list(self.preamble)
+        for kind, duration, part in zip(self.kinds, self.durations, self.__parts):
+            tags = part.before + ((TAG, kind, (str(duration),)),) + part.after
+            if part.same_block and tokens and tokens[-1][0] == BLOCK:
+                tokens[-1] = (BLOCK, '', tokens[-1][2] + tags)
+            else:
+                tokens.append((BLOCK, '', tags))
+            tokens.extend(part.tokens)
+        return tuple(tokens)
+
+
+def parse_karaoke(tokens: Sequence[Token]) -> Karaoke:
+    """
+    Parameters
+    ----------
+    tokens : tuple
+        Tokens of 'tags.parse_text'.
+
+    Returns
+    -------
+    Out : Karaoke
+        The syllables of the line, none when it has no karaoke tag.
+    """
+    preamble = []
+    kinds, durations, parts = [], array('l'), []
+    # the syllable being read: [before, after, tokens, same_block]
+    current = None
+
+    for token in tokens:
+        kind, _, value = token
+        if kind != BLOCK or not any(tag_kind == TAG and name in KaraokeTags for tag_kind, name, _ in value):
+            (preamble if current is None else current[2]).append(token)
+            continue
+
+        pending, same_block = [], False
+        for tag in value:
+            tag_kind, name, args = tag
+            if tag_kind == TAG and name in KaraokeTags:
+                if current is not None:
+                    parts.append(_Part(*map(tuple, current[:3]), current[3]))
+                kinds.append(name)
+                durations.append(_duration(args))
+                current = [pending, [], [], same_block]
+                pending, same_block = [], True
+            elif same_block:
+                current[1].append(tag)
+            else:
+                pending.append(tag)
+
+    if current is not None:
+        parts.append(_Part(*map(tuple, current[:3]), current[3]))
+    return Karaoke(tuple(preamble), tuple(kinds), durations, tuple(parts))
+
+
+def has_karaoke(text: str) -> bool:
+    """ Cheap test before parsing, every karaoke tag starts with '\\k' or '\\K'. """
+    return '\\k' in text or '\\K' in text
+
+
+def karaoke_events(events: Iterable) -> Iterable:
+    """ The events with karaoke tags, found without parsing the others. """
+    return (event for event in events if has_karaoke(event.text) and len(event.karaoke))
+
+
+def scale_karaoke(events: Iterable, factor: float) -> int:
+    """
+    Scale the syllable durations of every karaoke line and write the tags back.
+
+    Returns
+    -------
+    Out : int
+        Number of events changed, lines without karaoke are not parsed.
+    """
+    changed = 0
+    for event in karaoke_events(events):
+        event.karaoke = event.karaoke.scaled(factor)
+        changed += 1
+    return changed
+
+
+def syllable_table(events: Sequence) -> Tuple[array, array, array, List[str]]:
+    """
+    Returns
+    -------
+    Out : tuple
+        (event indices, absolute starts, absolute ends, plain texts) of every syllable of 'events',
+        from the cached Karaoke of each event.
+    """
+    indices, starts, ends, texts = array('l'), array('q'), array('q'), []
+    for index, event in enumerate(events):
+        if not has_karaoke(event.text):
+            continue
+        karaoke = event.karaoke
+        offsets = karaoke.offsets()
+        for number in range(len(karaoke)):
+            indices.append(index)
+            starts.append(event.start + offsets[number])
+            ends.append(event.start + offsets[number + 1])
+        texts.extend(karaoke.texts)
+    return indices, starts, ends, texts
@@ -0,0 +1,234 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Memory-mapped access for very large scripts.
+# Only byte offsets are recorded up front and lines are decoded when they are asked for.
+# Offsets are found by searching b'\n' and b'\n[', which is safe for UTF-8 and for
+# ASCII-compatible multibyte encodings such as GBK, Big5 and Shift-JIS, but not for UTF-16.
+
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from array import array
+from functools import partial
+import codecs
+import mmap
+import pathlib
+import re
+from .errors import ASSFileError
+from .charset import AUTO, SNIFF_SIZE, detect_encoding
+from .stream import split_lines
+from .tokenizer import classify, normalize_name, parse_format, FORMAT, ENTRY
+from .timestamp import parse_time
+from .attachments import Attachment, NamePrefixes
+from .records import Event, Style, EventTypes, EventFields, DefaultStyleFormat, DefaultEventFormat
+
+_EVENT_LINE = re.compile(
+    rb'^[ \t]*(?:' + b'|'.join(name.encode() for name in EventTypes) + rb')[ \t]*:', re.MULTILINE
+)
+_FORMAT_LINE = re.compile(rb'^[ \t]*Format[ \t]*:(.*)$', re.MULTILINE)
+# One attachment: its name line, then full data lines up to the first shorter one, as Aegisub reads them
+_ATTACHMENTS = {
+    key: re.compile(
+        rb'\s*' + re.escape(prefix.encode()) + rb'([^\n]*)(?:\n|\Z)'
+        rb'((?:[!-`]{80}[ \t\r]*(?:\n|\Z))*(?:[!-`]{1,79}[ \t\r]*(?:\n|\Z))?)'
+    )
+    for key, prefix in NamePrefixes.items()
+}
+
+
+class MappedASS:
+    """
+    A script opened through 'mmap'.
+
+    Nothing is parsed on open: '[Script Info]' and '[V4+ Styles]' are parsed when first read,
+    events are indexed by byte offset on first access and decoded one by one.
+    With encoding 'auto' the encoding is detected from the first bytes of the map.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path], encoding: str = 'utf-8-sig'):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if encoding == AUTO:
+            encoding = detect_encoding(self.__map[:SNIFF_SIZE])
+        try:
+            # the normalized name, e.g. 'UTF16' and 'utf_16_le' are 'utf-16' and 'utf-16-le'
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            self.close()
+            raise
+        if encoding.startswith(('utf-16', 'utf-32')):
+            self.close()
+            raise ASSFileError('{} scripts cannot be memory-mapped, open them with ASS'.format(encoding))
+        self.encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+        self.__body = 3 if self.__map[:3] == b'\xef\xbb\xbf' else 0
+
+        self.__sections = None
+        self.__script_info = None
+        self.__styles = None
+        self.__event_offsets = None
+        self.__attachments = {}
+        self.event_format = DefaultEventFormat
+        self.style_format = DefaultStyleFormat
+
+    def close(self):
+        self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __section_end(self, position: int) -> int:
+        end = self.__map.find(b'\n[', position)
+        return len(self.__map) if end < 0 else end + 1
+
+    def __iter_sections(self) -> Iterator[Tuple[str, int, int]]:
+        """ (normalized name, first byte, end byte) of each section body, jumping from header to header. """
+        position = self.__body
+        size = len(self.__map)
+        while position < size:
+            line_end = self.__map.find(b'\n', position)
+            if line_end < 0:
+                line_end = size
+            header = self.__map[position:line_end].decode(self.encoding).strip()
+            section_end = self.__section_end(line_end)
+            if header.startswith('[') and header.endswith(']'):
+                yield normalize_name(header[1:-1]), line_end + 1, section_end
+            position = section_end
+
+    def __find_section(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Find one section from the top without indexing the rest of the file. """
+        if self.__sections is not None:
+            return self.__sections.get(name)
+
+        for section_name, start, end in self.__iter_sections():
+            if section_name == name:
+                return start, end
+        return None
+
+    @property
+    def sections(self) -> Dict[str, Tuple[int, int]]:
+        """ Normalized section name -> (first byte, end byte) of its body. """
+        if self.__sections is None:
+            self.__sections = {}
+            for name, start, end in self.__iter_sections():
+                self.__sections.setdefault(name, (start, end))
+        return self.__sections
+
+    def __iter_lines(self, start: int, end: int) -> Iterator[str]:
+        return split_lines(self.__map[start:end].decode(self.encoding))
+
+    @property
+    def script_info(self) -> Dict[str, str]:
+        if self.__script_info is None:
+            self.__script_info = {}
+            section = self.__find_section('scriptinfo')
+            if section is not None:
+                for line in self.__iter_lines(*section):
+                    kind, key, value = classify(line)
+                    if kind == ENTRY or kind == FORMAT:
+                        self.__script_info[key] = value
+        return self.__script_info
+
+    @property
+    def styles(self) -> Dict[str, Style]:
+        if self.__styles is None:
+            self.__styles = {}
+            section = self.__find_section('v4+styles') or self.__find_section('v4styles')
+            if section is not None:
+                for line in self.__iter_lines(*section):
+                    kind, key, value = classify(line)
+                    if kind == FORMAT:
+                        self.style_format = parse_format(value)
+                    elif kind == ENTRY and key == 'Style':
+                        style = Style(value, self.style_format)
+                        self.__styles[style.name] = style
+        return self.__styles
+
+    def __read(self, start: int, end: int) -> bytes:
+        return self.__map[start:end]
+
+    def __attachment_section(self, section_key: str) -> List[Attachment]:
+        """
+        Attachments are matched one after the other from the section header, so that data lines
+        starting with '[' do not end the section. Only their offsets are kept until they are decoded.
+        """
+        attachments = self.__attachments.get(section_key)
+        if attachments is None:
+            attachments = self.__attachments[section_key] = []
+            section = self.__find_section(section_key)
+            if section is not None:
+                pattern = _ATTACHMENTS[section_key]
+                match = pattern.match(self.__map, section[0])
+                while match is not None:
+                    attachments.append(Attachment(
+                        match.group(1).decode(self.encoding).strip(), partial(self.__read, *match.span(2))
+                    ))
+                    match = pattern.match(self.__map, match.end())
+        return attachments
+
+    @property
+    def fonts(self) -> List[Attachment]:
+        return self.__attachment_section('fonts')
+
+    @property
+    def graphics(self) -> List[Attachment]:
+        return self.__attachment_section('graphics')
+
+    @property
+    def event_offsets(self) -> array:
+        """ Byte offset of every event line, found in one regex scan over the mapped '[Events]'. """
+        if self.__event_offsets is None:
+            self.__event_offsets = array('q')
+            section = self.__find_section('events')
+            if section is not None:
+                start, end = section
+                self.__event_offsets.extend(match.start() for match in _EVENT_LINE.finditer(self.__map, start, end))
+
+                format_match = _FORMAT_LINE.search(self.__map, start, end)
+                if format_match is not None:
+                    self.event_format = parse_format(format_match.group(1).decode(self.encoding))
+        return self.__event_offsets
+
+    def __len__(self):
+        return len(self.event_offsets)
+
+    def line(self, index: int) -> str:
+        """ Decoded text of the event line at 'index'. """
+        offset = self.event_offsets[index]
+        end = self.__map.find(b'\n', offset)
+        return self.__map[offset:len(self.__map) if end < 0 else end].decode(self.encoding)
+
+    def event(self, index: int) -> Event:
+        kind, key, value = classify(self.line(index))
+        return EventTypes[key](value, self.event_format)
+
+    def __getitem__(self, index: int) -> Event:
+        return self.event(index)
+
+    def iter_events(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Event]:
+        """
+        Returns
+        -------
+        Out : iterator
+            Events overlapping [start, end) in centiseconds, all events when both are None.
+            Only the timing columns are converted for events outside the range.
+        """
+        offsets = self.event_offsets
+        event_format = self.event_format
+        fields = [EventFields.get(normalize_name(column), (None,))[0] for column in event_format]
+        start_column, end_column = fields.index('start'), fields.index('end')
+
+        for index in range(len(offsets)):
+            kind, key, value = classify(self.line(index))
+            if start is not None or end is not None:
+                columns = value.split(',', max(start_column, end_column) + 1)
+                if start is not None and parse_time(columns[end_column].strip()) <= start:
+                    continue
+                if end is not None and parse_time(columns[start_column].strip()) >= end:
+                    continue
+            yield EventTypes[key](value, event_format)
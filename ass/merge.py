@@ -0,0 +1,426 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Diff and three-way merge of scripts, e.g. of the copies of a translator and a timer.
+#
+# Every record is reduced to a hashable key of all its values, so equal lines are found by
+# dict lookups rather than by comparing records pairwise. Events are aligned as in patience diff:
+# common prefix and suffix, then the lines occurring once on both sides, kept in order by a
+# longest increasing subsequence, then the same again between those anchors. Lines left over
+# between anchors are paired as changed when they share their timing and style, or their text.
+
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Union
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from operator import attrgetter
+from .records import Record, Event
+
+INSERTED = 0
+REMOVED = 1
+CHANGED = 2
+
+# Record type -> getter of the values of all its slots but 'nonstandard'
+_getters = {}
+
+
+class Change(NamedTuple):
+    kind: int
+    # event indices, or style names and script info keys
+    old: Union[int, str, None]
+    new: Union[int, str, None]
+    # names of the fields that differ, for CHANGED
+    fields: Tuple[str, ...]
+
+
+class DocumentDiff(NamedTuple):
+    script_info: List[Change]
+    styles: List[Change]
+    events: List[Change]
+
+    def __bool__(self):
+        return bool(self.script_info or self.styles or self.events)
+
+
+class Conflict(NamedTuple):
+    # 'script_info', 'styles' or 'events'
+    section: str
+    # script info key, style name, or index of the event in the merged script
+    key: Union[int, str]
+    # fields changed differently on both sides, empty when one side removed what the other changed
+    fields: Tuple[str, ...]
+    base: object
+    ours: object
+    theirs: object
+
+
+class MergeResult(NamedTuple):
+    document: object
+    conflicts: List[Conflict]
+
+
+def _field_names(record_type: type) -> tuple:
+    return tuple(name for name in record_type._defaults if name != 'nonstandard')
+
+
+def record_key(record: Record) -> tuple:
+    """
+    Returns
+    -------
+    Out : tuple
+        Hashable key of the type and every value of 'record', equal for equal records.
+    """
+    record_type = type(record)
+    getter = _getters.get(record_type)
+    if getter is None:
+        getter = _getters[record_type] = attrgetter(*_field_names(record_type))
+    nonstandard = record.nonstandard
+    return record_type, getter(record), tuple(sorted(nonstandard.items())) if nonstandard else None
+
+
+def changed_fields(old: Record, new: Record) -> Tuple[str, ...]:
+    names = [name for name in _field_names(type(new)) if getattr(old, name) != getattr(new, name)]
+    if (old.nonstandard or None) != (new.nonstandard or None):
+        names.append('nonstandard')
+    if type(old) is not type(new):
+        names.insert(0, 'type')
+    return tuple(names)
+
+
+def _increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """ Longest subsequence of 'pairs', sorted by their first item, increasing in the second, by patience sorting. """
+    tails, tail_indices, previous = [], [], [None] * len(pairs)
+    for index, (_, second) in enumerate(pairs):
+        position = bisect_left(tails, second)
+        if position:
+            previous[index] = tail_indices[position - 1]
+        if position == len(tails):
+            tails.append(second)
+            tail_indices.append(index)
+        else:
+            tails[position] = second
+            tail_indices[position] = index
+
+    result = []
+    index = tail_indices[-1] if tail_indices else None
+    while index is not None:
+        result.append(pairs[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+
+def intern_keys(table: dict, records: Sequence[Record]) -> List[int]:
+    """ Number the record keys of 'records' in 'table', equal records get equal numbers. """
+    return [table.setdefault(key, len(table)) for key in map(record_key, records)]
+
+
+def align(old_keys: Sequence, new_keys: Sequence) -> List[Tuple[int, int]]:
+    """
+    Parameters
+    ----------
+    old_keys, new_keys : sequence
+        Hashable keys, best small ints from 'intern_keys', as tuples are hashed again on every lookup.
+
+    Returns
+    -------
+    Out : list
+        Increasing (old index, new index) pairs of equal keys, a patience diff of the sequences.
+        Runs in O(n log n) on sequences whose lines mostly occur once.
+    """
+    matches = []
+    ranges = [(0, len(old_keys), 0, len(new_keys))]
+    while ranges:
+        old_low, old_high, new_low, new_high = ranges.pop()
+        while old_low < old_high and new_low < new_high and old_keys[old_low] == new_keys[new_low]:
+            matches.append((old_low, new_low))
+            old_low += 1
+            new_low += 1
+        while old_low < old_high and new_low < new_high and old_keys[old_high - 1] == new_keys[new_high - 1]:
+            old_high -= 1
+            new_high -= 1
+            matches.append((old_high, new_high))
+        if old_low == old_high or new_low == new_high:
+            continue
+
+        old_slice, new_slice = old_keys[old_low:old_high], new_keys[new_low:new_high]
+        old_counts, new_counts = Counter(old_slice), Counter(new_slice)
+        new_positions = dict(zip(new_slice, range(new_low, new_high)))
+        anchors = [
+            (index, new_positions[key]) for index, key in enumerate(old_slice, old_low)
+            if old_counts[key] == 1 and new_counts.get(key) == 1
+        ]
+        if not all(first[1] < second[1] for first, second in zip(anchors, anchors[1:])):
+            # lines moved around, keep the longest run in order
+            anchors = _increasing(anchors)
+        if not anchors:
+            continue
+
+        matches.extend(anchors)
+        bounds = [(old_low - 1, new_low - 1)] + anchors + [(old_high, new_high)]
+        for (old_start, new_start), (old_end, new_end) in zip(bounds, bounds[1:]):
+            if old_end - old_start > 1 and new_end - new_start > 1:
+                ranges.append((old_start + 1, old_end, new_start + 1, new_end))
+    matches.sort()
+    return matches
+
+
+def _pair_changed(old: Sequence[Event], new: Sequence[Event], old_indices: List[int], new_indices: List[int]):
+    """ Pair removed and inserted events with the same timing and style, then the rest with the same text. """
+    pairs = []
+    for key in (attrgetter('start', 'end', 'style'), attrgetter('text')):
+        waiting = defaultdict(deque)
+        for index in new_indices:
+            waiting[key(new[index])].append(index)
+        unpaired = []
+        for index in old_indices:
+            candidates = waiting.get(key(old[index]))
+            if candidates:
+                pairs.append((index, candidates.popleft()))
+            else:
+                unpaired.append(index)
+        paired = {new_index for _, new_index in pairs}
+        old_indices = unpaired
+        new_indices = [index for index in new_indices if index not in paired]
+    return pairs, old_indices, new_indices
+
+
+def _event_changes(
+        old: Sequence[Event],
+        new: Sequence[Event],
+        old_keys: Sequence[int],
+        new_keys: Sequence[int]
+) -> Tuple[List[Change], Dict[int, int]]:
+    """ The changes and the mapping of old to new index of every event kept, changed or not. """
+    matches = align(old_keys, new_keys)
+    mapping = dict(matches)
+    changes = []
+    bounds = [(-1, -1)] + matches + [(len(old), len(new))]
+    for (old_start, new_start), (old_end, new_end) in zip(bounds, bounds[1:]):
+        if old_end - old_start == 1 and new_end - new_start == 1:
+            continue
+        pairs, removed, inserted = _pair_changed(
+            old, new, list(range(old_start + 1, old_end)), list(range(new_start + 1, new_end))
+        )
+        changes.extend(Change(REMOVED, index, None, ()) for index in removed)
+        for old_index, new_index in sorted(pairs):
+            mapping[old_index] = new_index
+            changes.append(Change(CHANGED, old_index, new_index, changed_fields(old[old_index], new[new_index])))
+        changes.extend(Change(INSERTED, None, index, ()) for index in inserted)
+    return changes, mapping
+
+
+def _keyed_changes(old: dict, new: dict, compare) -> List[Change]:
+    changes = [Change(REMOVED, name, None, ()) for name in old if name not in new]
+    for name, value in new.items():
+        if name not in old:
+            changes.append(Change(INSERTED, None, name, ()))
+        elif old[name] is not value:
+            fields = compare(old[name], value)
+            if fields:
+                changes.append(Change(CHANGED, name, name, fields))
+    return changes
+
+
+def _compare_records(old: Record, new: Record) -> tuple:
+    return changed_fields(old, new) if record_key(old) != record_key(new) else ()
+
+
+def _compare_values(old: str, new: str) -> tuple:
+    return ('value',) if old != new else ()
+
+
+def diff_documents(old, new) -> DocumentDiff:
+    """
+    Parameters
+    ----------
+    old, new : ASS
+        Scripts to compare, any of 'ASS', 'Document' or scripts loaded from cache.
+
+    Returns
+    -------
+    Out : DocumentDiff
+        Changes to script info and styles by key, and to events by index in 'old' and 'new',
+        in file order. Events only moved around are reported as removed and inserted.
+    """
+    table = {}
+    return DocumentDiff(
+        _keyed_changes(old.script_info, new.script_info, _compare_values),
+        _keyed_changes(old.styles, new.styles, _compare_records),
+        _event_changes(old.events, new.events, intern_keys(table, old.events), intern_keys(table, new.events))[0]
+    )
+
+
+def _merge_record(
+        base: Record,
+        ours: Record,
+        theirs: Record,
+        keys: Union[tuple, None] = None
+) -> Tuple[Record, Tuple[str, ...]]:
+    """
+    Field by field, returns the merged record and the fields changed differently on both sides.
+    'keys' are the record keys of the three records, or their numbers from 'intern_keys', when already known.
+    """
+    if ours is base or ours is theirs:
+        return theirs, ()
+    if theirs is base:
+        return ours, ()
+    base_key, our_key, their_key = keys if keys is not None else map(record_key, (base, ours, theirs))
+    if our_key == base_key or our_key == their_key:
+        return theirs, ()
+    if their_key == base_key:
+        return ours, ()
+
+    merged = ours.copy()
+    conflicts = []
+    for name in _field_names(type(ours)):
+        base_value, our_value, their_value = getattr(base, name), getattr(ours, name), getattr(theirs, name)
+        if our_value == base_value:
+            setattr(merged, name, their_value)
+        elif their_value != base_value and their_value != our_value:
+            conflicts.append(name)
+    base_nonstandard, our_nonstandard = base.nonstandard or None, ours.nonstandard or None
+    their_nonstandard = theirs.nonstandard or None
+    if our_nonstandard == base_nonstandard:
+        merged.nonstandard = None if their_nonstandard is None else dict(their_nonstandard)
+    elif their_nonstandard not in (base_nonstandard, our_nonstandard):
+        conflicts.append('nonstandard')
+
+    if type(theirs) is not type(ours):
+        if type(ours) is type(base):
+            # e.g. a line commented out on their side only
+            merged = type(theirs)(**merged.to_dict())
+        elif type(theirs) is not type(base):
+            conflicts.insert(0, 'type')
+    return merged, tuple(conflicts)
+
+
+def _merge_value(base: str, ours: str, theirs: str) -> Tuple[str, tuple]:
+    if ours == base or ours == theirs:
+        return theirs, ()
+    if theirs == base:
+        return ours, ()
+    return ours, ('value',)
+
+
+def _merge_keyed(section: str, base: dict, ours: dict, theirs: dict, merge, compare, conflicts: list) -> dict:
+    """ Merge script info or styles by key, in the order of 'ours' then of the keys only 'theirs' has. """
+    merged = {}
+    for name in list(ours) + [name for name in theirs if name not in ours]:
+        base_value, our_value, their_value = base.get(name), ours.get(name), theirs.get(name)
+        if our_value is None or their_value is None:
+            kept = their_value if our_value is None else our_value
+            if base_value is None:
+                # added on one side
+                merged[name] = kept
+            elif compare(base_value, kept):
+                # removed on one side, changed on the other: keep the change
+                conflicts.append(Conflict(section, name, (), base_value, our_value, their_value))
+                merged[name] = kept
+            continue
+
+        if base_value is None:
+            # added on both sides
+            value, fields = our_value, compare(our_value, their_value)
+        else:
+            value, fields = merge(base_value, our_value, their_value)
+        if fields:
+            conflicts.append(Conflict(section, name, fields, base_value, our_value, their_value))
+        merged[name] = value
+    return merged
+
+
+def _insertions(new: Sequence[Event], mapping: Dict[int, int], length: int) -> Dict[int, List[int]]:
+    """ Inserted events by the index of the base event they come before, 'length' for the end. """
+    following = {}
+    position = length
+    kept = {new_index: old_index for old_index, new_index in mapping.items()}
+    for index in range(len(new) - 1, -1, -1):
+        if index in kept:
+            position = kept[index]
+        else:
+            following.setdefault(position, []).append(index)
+    for indices in following.values():
+        indices.reverse()
+    return following
+
+
+def merge_documents(base, ours, theirs) -> MergeResult:
+    """
+    Three-way merge of two scripts derived from 'base'.
+
+    A change made on one side only is taken. Events and styles changed on both sides are merged
+    field by field, so a new text from one side and a new timing from the other make one line.
+    A field changed differently on both sides keeps our value and is reported as a conflict,
+    as is a line removed on one side and changed on the other, which is kept.
+    Lines inserted on both sides at the same place are all kept, ours first.
+
+    Returns
+    -------
+    Out : MergeResult
+        An 'ASS' holding the merged script info, styles and events, and the conflicts.
+        Formats, other sections and attachments are those of 'ours'.
+    """
+    from . import ASS
+    document = ASS()
+    document.style_format, document.event_format = ours.style_format, ours.event_format
+    document.nonstandard_sections = {name: list(lines) for name, lines in ours.nonstandard_sections.items()}
+    document.fonts, document.graphics = list(ours.fonts), list(ours.graphics)
+    # records are shared with the three scripts, as a clone they are copied before being changed in place
+    document = document.clone()
+
+    conflicts = []
+    document.script_info = _merge_keyed(
+        'script_info', base.script_info, ours.script_info, theirs.script_info, _merge_value, _compare_values, conflicts
+    )
+    document.styles = _merge_keyed(
+        'styles', base.styles, ours.styles, theirs.styles, _merge_record, _compare_records, conflicts
+    )
+
+    base_events = base.events
+    table = {}
+    base_keys = intern_keys(table, base_events)
+    our_keys = intern_keys(table, ours.events)
+    their_keys = intern_keys(table, theirs.events)
+    _, our_mapping = _event_changes(base_events, ours.events, base_keys, our_keys)
+    _, their_mapping = _event_changes(base_events, theirs.events, base_keys, their_keys)
+    length = len(base_events)
+    our_insertions = _insertions(ours.events, our_mapping, length)
+    their_insertions = _insertions(theirs.events, their_mapping, length)
+
+    events = []
+    for index in range(length + 1):
+        inserted = [ours.events[new_index] for new_index in our_insertions.get(index, ())]
+        if index in their_insertions:
+            keys = {our_keys[new_index] for new_index in our_insertions.get(index, ())}
+            inserted.extend(
+                theirs.events[new_index] for new_index in their_insertions[index] if their_keys[new_index] not in keys
+            )
+        events.extend(inserted)
+        if index == length:
+            break
+
+        event = base_events[index]
+        our_index, their_index = our_mapping.get(index), their_mapping.get(index)
+        our_event = None if our_index is None else ours.events[our_index]
+        their_event = None if their_index is None else theirs.events[their_index]
+        if our_event is None and their_event is None:
+            continue
+        if our_event is None or their_event is None:
+            kept = our_event if their_event is None else their_event
+            if (our_keys[our_index] if their_event is None else their_keys[their_index]) != base_keys[index]:
+                conflicts.append(Conflict('events', len(events), (), event, our_event, their_event))
+                events.append(kept)
+            continue
+
+        merged, fields = _merge_record(
+            event, our_event, their_event, (base_keys[index], our_keys[our_index], their_keys[their_index])
+        )
+        if fields:
+            conflicts.append(Conflict('events', len(events), fields, event, our_event, their_event))
+        events.append(merged)
+
+    document.events = events
+    return MergeResult(document, conflicts)
@@ -0,0 +1,227 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Opt-in instrumentation of parsing.
+# The parser only looks at its profiler when a section starts, and lines are counted by wrapping
+# the line iterator, so a parse without profiler runs the same code as before.
+# Time spent reading and decoding the lines of a section counts toward that section.
+
+from typing import Callable, Dict, Iterable, Iterator, Optional
+import os
+import pathlib
+import time
+import tracemalloc
+
+# Section key -> phase name
+PhaseNames = {
+    'scriptinfo': 'script_info',
+    'v4+styles': 'styles',
+    'v4styles': 'styles',
+    'events': 'events',
+    'fonts': 'fonts',
+    'graphics': 'graphics'
+}
+
+_hooks = []
+
+
+def add_hook(callback: Callable[['ParseStats'], None]):
+    """ Profile every parse from now on and pass its stats to 'callback', e.g. to forward them to metrics. """
+    if callback not in _hooks:
+        _hooks.append(callback)
+
+
+def remove_hook(callback: Callable[['ParseStats'], None]):
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+def hooks_enabled() -> bool:
+    return bool(_hooks)
+
+
+class PhaseStats:
+    __slots__ = ('seconds', 'lines', 'characters', 'allocated')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.lines = 0
+        self.characters = 0
+        # net bytes allocated while tracing allocations, None otherwise
+        self.allocated = None
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return '<PhaseStats {}>'.format(self.to_dict())
+
+
+class ParseStats:
+    """
+    What one parse spent, per phase: 'open', 'preamble' (lines before the first section),
+    then one phase per section kind, see 'PhaseNames', and 'nonstandard' for the other sections.
+    """
+
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self.bytes = None
+        self.seconds = 0.0
+        self.phases: Dict[str, PhaseStats] = {}
+        self.styles = 0
+        self.events = 0
+        # columns kept in the 'nonstandard' overflow dict of records, and lines of nonstandard sections
+        self.nonstandard_fields = 0
+        self.nonstandard_lines = 0
+        # tracemalloc.StatisticDiff of the biggest allocation sites, when allocations are traced
+        self.allocations = None
+
+    @property
+    def lines(self) -> int:
+        return sum(phase.lines for phase in self.phases.values())
+
+    @property
+    def characters(self) -> int:
+        return sum(phase.characters for phase in self.phases.values())
+
+    def to_dict(self) -> dict:
+        """
+        Returns
+        -------
+        Out : dict
+            Flat, JSON serializable stats, phases as nested dicts and allocations as 'file:line' -> bytes.
+        """
+        return {
+            'source': self.source,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'lines': self.lines,
+            'characters': self.characters,
+            'styles': self.styles,
+            'events': self.events,
+            'nonstandard_fields': self.nonstandard_fields,
+            'nonstandard_lines': self.nonstandard_lines,
+            'phases': {name: phase.to_dict() for name, phase in self.phases.items()},
+            'allocations': None if self.allocations is None else {
+                '{}:{}'.format(diff.traceback[0].filename, diff.traceback[0].lineno): diff.size_diff
+                for diff in self.allocations
+            }
+        }
+
+    def __repr__(self):
+        phases = ', '.join('{} {:.3f}s'.format(name, phase.seconds) for name, phase in self.phases.items())
+        return '<ParseStats {:.3f}s {} lines: {}>'.format(self.seconds, self.lines, phases)
+
+
+class ParseProfiler:
+    """
+    Collects the ParseStats of one parse, pass it as 'profiler' to 'ASS'.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with the stats when the parse is done, as are the hooks of 'add_hook'.
+    trace_allocations : bool
+        Measure allocations with tracemalloc, which slows parsing down several times.
+    top : int
+        Number of allocation sites kept in 'ParseStats.allocations'.
+    """
+
+    def __init__(
+            self,
+            callback: Optional[Callable[[ParseStats], None]] = None,
+            trace_allocations: bool = False,
+            top: int = 10
+    ):
+        self.callback = callback
+        self.trace_allocations = trace_allocations
+        self.top = top
+        self.stats = None
+        self.__phase = None
+        self.__phase_start = 0.0
+        self.__memory_start = 0
+        self.__started_tracing = False
+        self.__snapshot = None
+
+    def start(self, source=None):
+        """ Start timing the 'open' phase of a parse of 'source', as given to 'ASS'. """
+        self.stats = stats = ParseStats()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            stats.bytes = len(source)
+        elif isinstance(source, (str, pathlib.Path)) and os.path.isfile(source):
+            stats.source = str(source)
+            stats.bytes = os.path.getsize(source)
+        elif hasattr(source, 'name'):
+            stats.source = str(source.name)
+
+        if self.trace_allocations:
+            self.__started_tracing = not tracemalloc.is_tracing()
+            if self.__started_tracing:
+                tracemalloc.start()
+            self.__snapshot = tracemalloc.take_snapshot()
+        self.enter('open')
+
+    def wrap(self, lines: Iterable[str]) -> Iterator[str]:
+        """ Count the lines and characters read into the current phase. """
+        for line in lines:
+            phase = self.__phase
+            phase.lines += 1
+            phase.characters += len(line)
+            yield line
+
+    def __close_phase(self):
+        phase = self.__phase
+        if phase is not None:
+            phase.seconds += time.perf_counter() - self.__phase_start
+            if self.trace_allocations:
+                phase.allocated = (phase.allocated or 0) + tracemalloc.get_traced_memory()[0] - self.__memory_start
+            self.__phase = None
+
+    def enter(self, phase_name: str):
+        """ Close the current phase and start 'phase_name', phases of the same name add up. """
+        self.__close_phase()
+        phase = self.stats.phases.get(phase_name)
+        if phase is None:
+            phase = self.stats.phases[phase_name] = PhaseStats()
+        self.__phase = phase
+        if self.trace_allocations:
+            self.__memory_start = tracemalloc.get_traced_memory()[0]
+        self.__phase_start = time.perf_counter()
+
+    def enter_section(self, section_key: str):
+        self.enter(PhaseNames.get(section_key, 'nonstandard'))
+
+    def __stop_tracing(self):
+        self.__snapshot = None
+        if self.__started_tracing:
+            self.__started_tracing = False
+            tracemalloc.stop()
+
+    def abort(self):
+        """ Close the phase of a failed parse and stop the tracing 'start' began, nothing to do after 'finish'. """
+        self.__close_phase()
+        self.__stop_tracing()
+
+    def finish(self, ass) -> ParseStats:
+        """ Close the last phase, count what 'ass' holds and call the callbacks. """
+        self.__close_phase()
+        stats = self.stats
+        stats.seconds = sum(phase.seconds for phase in stats.phases.values())
+
+        if self.trace_allocations:
+            stats.allocations = tracemalloc.take_snapshot().compare_to(self.__snapshot, 'lineno')[:self.top]
+        self.__stop_tracing()
+
+        stats.styles = len(ass.styles)
+        stats.events = len(ass.events)
+        for record in (*ass.styles.values(), *ass.events):
+            if record.nonstandard:
+                stats.nonstandard_fields += len(record.nonstandard)
+        stats.nonstandard_lines = sum(len(lines) for lines in ass.nonstandard_sections.values())
+
+        for callback in ([self.callback] if self.callback is not None else []) + _hooks:
+            callback(stats)
+        return stats
@@ -0,0 +1,433 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+from typing import Union
+import sys
+from .errors import ASSFileError
+from .tokenizer import normalize_name
+from .timestamp import parse_time, format_time
+from .color import parse_color, format_color
+from .tags import parse_text, build_text, parse_effect
+from .karaoke import parse_karaoke, Karaoke
+
+
+def to_number_str(value: float) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        '20' for 20.0 and '2.5' for 2.5, as written by Aegisub.
+    """
+    return '%d' % value if value == int(value) else repr(value)
+
+
+def _verbatim(value: str) -> str:
+    return value
+
+
+StyleFields = {
+    'name': ('name', sys.intern, _verbatim),
+    'fontname': ('font_name', str, _verbatim),
+    'fontsize': ('font_size', float, to_number_str),
+    'primarycolour': ('primary_color', parse_color, format_color),
+    'secondarycolour': ('secondary_color', parse_color, format_color),
+    'outlinecolour': ('outline_color', parse_color, format_color),
+    'backcolour': ('background_color', parse_color, format_color),
+    'bold': ('bold', int, str),
+    'italic': ('italic', int, str),
+    'underline': ('underline', int, str),
+    'strikeout': ('strike_out', int, str),
+    'scalex': ('scale_x', float, to_number_str),
+    'scaley': ('scale_y', float, to_number_str),
+    'spacing': ('spacing', float, to_number_str),
+    'angle': ('angle', float, to_number_str),
+    'borderstyle': ('border_style', int, str),
+    'outline': ('outline', float, to_number_str),
+    'shadow': ('shadow', float, to_number_str),
+    'alignment': ('alignment', int, str),
+    'marginl': ('margin_l', int, str),
+    'marginr': ('margin_r', int, str),
+    'marginv': ('margin_v', int, str),
+    'encoding': ('encoding', int, str)
+}
+
+EventFields = {
+    'layer': ('layer', int, str),
+    'marked': ('marked', str, _verbatim),
+    'start': ('start', parse_time, format_time),
+    'end': ('end', parse_time, format_time),
+    'style': ('style', sys.intern, _verbatim),
+    'name': ('speaker_name', str, _verbatim),
+    'marginl': ('margin_l', int, str),
+    'marginr': ('margin_r', int, str),
+    'marginv': ('margin_v', int, str),
+    'effect': ('effect', str, _verbatim),
+    'text': ('text', str, _verbatim)
+}
+
+DefaultStyleFormat = (
+    'Name', 'Fontname', 'Fontsize', 'PrimaryColour', 'SecondaryColour',
+    'OutlineColour', 'BackColour', 'Bold', 'Italic', 'Underline', 'StrikeOut',
+    'ScaleX', 'ScaleY', 'Spacing', 'Angle', 'BorderStyle', 'Outline', 'Shadow',
+    'Alignment', 'MarginL', 'MarginR', 'MarginV', 'Encoding'
+)
+
+DefaultEventFormat = (
+    'Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text'
+)
+
+
+StyleDefaults = {
+    'name': 'Default',
+    'font_name': 'Arial',
+    'font_size': 48.0,
+    'primary_color': 0x00FFFFFF,
+    'secondary_color': 0x000000FF,
+    'outline_color': 0x00000000,
+    'background_color': 0x00000000,
+    'bold': 0,
+    'italic': 0,
+    'underline': 0,
+    'strike_out': 0,
+    'scale_x': 100.0,
+    'scale_y': 100.0,
+    'spacing': 0.0,
+    'angle': 0.0,
+    'border_style': 1,
+    'outline': 2.0,
+    'shadow': 2.0,
+    'alignment': 2,
+    'margin_l': 10,
+    'margin_r': 10,
+    'margin_v': 10,
+    'encoding': 1
+}
+
+EventDefaults = {
+    'layer': 0,
+    'marked': '',
+    'start': 0,
+    'end': 0,
+    'style': 'Default',
+    'speaker_name': '',
+    'margin_l': 0,
+    'margin_r': 0,
+    'margin_v': 0,
+    'effect': '',
+    'text': ''
+}
+
+
+class Record:
+    """
+    A row of the '[V4+ Styles]' or '[Events]' section.
+
+    Records are slotted: columns listed in '_fields' are converted and stored in fixed slots,
+    other columns are kept as text in the 'nonstandard' overflow dict.
+    Slots that were never set read as their value in '_defaults'.
+    Rows are decoded by a function generated for their 'Format:' line, see '_decoder'.
+    """
+    __slots__ = ('nonstandard',)
+
+    _fields = {}
+    _resolved = {}
+    _encoded = {}
+    _decoders = {}
+    _defaults = {'nonstandard': None}
+    _default_format = ()
+
+    def __init__(
+            self,
+            row: Union[str, None] = None,
+            row_format: Union[tuple, None] = None,
+            **values
+    ):
+        if row is not None:
+            if row_format is None:
+                row_format = self._default_format
+
+            decoder = self._decoders.get(row_format)
+            if decoder is None:
+                decoder = self._decoder(row_format)
+            decoder(self, row)
+
+            if values:
+                # columns of the row win over 'values', which win over the defaults the decoder set
+                attributes = self._resolve(row_format)[0]
+                nonstandard = values.pop('nonstandard', None)
+                if nonstandard:
+                    self.nonstandard = dict(nonstandard, **(self.nonstandard or {}))
+                values = {name: value for name, value in values.items() if name not in attributes}
+
+        for attribute, value in values.items():
+            setattr(self, attribute, value)
+
+    @classmethod
+    def _resolve(cls, row_format: tuple) -> tuple:
+        """
+        Returns
+        -------
+        Out : tuple
+            (attribute names, converters) in column order.
+            Nonstandard columns have no attribute, 'Text' has no converter as it is kept verbatim.
+            Resolved once per format and cached on the class.
+        """
+        resolved = cls._resolved.get(row_format)
+        if resolved is None:
+            attributes, converters = [], []
+            for param_name in row_format:
+                field_name = normalize_name(param_name)
+                mapping = cls._fields.get(field_name, (None, None, None))
+                attributes.append(mapping[0])
+                converters.append(None if field_name == 'text' else mapping[1])
+            resolved = cls._resolved[row_format] = (tuple(attributes), tuple(converters))
+        return resolved
+
+    @classmethod
+    def _decoder(cls, row_format: tuple):
+        """
+        Returns
+        -------
+        Out : function
+            'decode(record, row)' generated for 'row_format': one 'str.split' unpacked into locals,
+            then one converter call per column, in column order. Built once per format and cached on the class.
+        """
+        decoder = cls._decoders.get(row_format)
+        if decoder is not None:
+            return decoder
+
+        count = len(row_format)
+        columns = ', '.join('column%d' % index for index in range(count))
+        namespace = {
+            'ASSFileError': ASSFileError,
+            'names': row_format,
+            'message': 'Expect %d columns but got {}: {!r}' % count
+        }
+        body = [
+            'def decode(record, row):',
+            '    try:',
+            '        %s, = row.split(",", %d)' % (columns, count - 1),
+            '    except ValueError:',
+            '        raise ASSFileError(message.format(len(row.split(",", %d)), row)) from None' % (count - 1)
+        ]
+
+        attributes, converters = cls._resolve(row_format)
+        if None in attributes:
+            body += [
+                '    nonstandard = record.nonstandard',
+                '    if nonstandard is None:',
+                '        nonstandard = record.nonstandard = {}'
+            ]
+        for index, (attribute, converter) in enumerate(zip(attributes, converters)):
+            if attribute is None:
+                # column names come from the file, so they are looked up rather than written into the code
+                body.append('    nonstandard[names[%d]] = column%d.strip()' % (index, index))
+            elif converter is None:
+                body.append('    record.%s = column%d' % (attribute, index))
+            elif converter is int or converter is float:
+                # both already skip surrounding whitespace
+                namespace['convert%d' % index] = converter
+                body.append('    record.%s = convert%d(column%d)' % (attribute, index, index))
+            else:
+                namespace['convert%d' % index] = converter
+                body.append('    record.%s = convert%d(column%d.strip())' % (attribute, index, index))
+        # slots without a column get their default, so that reading them never falls back to '__getattr__'
+        for name, value in cls._defaults.items():
+            if name not in attributes and (name != 'nonstandard' or None not in attributes):
+                namespace['default_' + name] = value
+                body.append('    record.%s = default_%s' % (name, name))
+
+        exec('\n'.join(body), namespace)
+        decoder = cls._decoders[row_format] = namespace['decode']
+        return decoder
+
+    @classmethod
+    def _encoders(cls, row_format: tuple) -> tuple:
+        """
+        Returns
+        -------
+        Out : tuple
+            (column name, attribute, formatter) in column order, cached per format.
+        """
+        encoders = cls._encoded.get(row_format)
+        if encoders is None:
+            encoders = cls._encoded[row_format] = tuple(
+                (param_name,) + cls._fields.get(normalize_name(param_name), (None, None, None))[0::2]
+                for param_name in row_format
+            )
+        return encoders
+
+    def to_row(self, row_format: Union[tuple, None] = None) -> str:
+        """
+        Returns
+        -------
+        Out : str
+            The row text after 'Style: ' or 'Dialogue: ', columns in the order of 'row_format'.
+        """
+        if row_format is None:
+            row_format = self._default_format
+
+        nonstandard = self.nonstandard or {}
+        return ','.join([
+            nonstandard.get(param_name, '') if attribute is None else formatter(getattr(self, attribute))
+            for param_name, attribute, formatter in self._encoders(row_format)
+        ])
+
+    def __getattr__(self, name):
+        try:
+            return self._defaults[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __reduce__(self):
+        """ Pickle as the class and a flat tuple of values, which keeps pickles and caches compact. """
+        return _rebuild, (type(self), tuple([getattr(self, name) for name in self._defaults]))
+
+    def copy(self) -> 'Record':
+        """
+        Returns
+        -------
+        Out : Record
+            A record of the same type with the same values and its own 'nonstandard' dict.
+        """
+        record = _rebuild(type(self), tuple([getattr(self, name) for name in self._defaults]))
+        if self.nonstandard is not None:
+            record.nonstandard = dict(self.nonstandard)
+        return record
+
+    def to_dict(self) -> dict:
+        """
+        Returns
+        -------
+        Out : dict
+            Every slot with its current (or default) value.
+        """
+        return {name: getattr(self, name) for name in self._defaults}
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.to_dict())
+
+
+def _rebuild(record_type: type, values: tuple) -> Record:
+    record = record_type.__new__(record_type)
+    for name, value in zip(record_type._defaults, values):
+        setattr(record, name, value)
+    return record
+
+
+class Style(Record):
+    __slots__ = tuple(StyleDefaults)
+
+    _fields = StyleFields
+    _resolved = {}
+    _encoded = {}
+    _decoders = {}
+    _defaults = dict(StyleDefaults, nonstandard=None)
+    _default_format = DefaultStyleFormat
+
+
+class Event(Record):
+    # 'text' is a property over '_text', so that the parsed '_tokens' and '_karaoke' are dropped on change
+    __slots__ = tuple(name for name in EventDefaults if name != 'text') + ('_text', '_tokens', '_karaoke')
+
+    _fields = EventFields
+    _resolved = {}
+    _encoded = {}
+    _decoders = {}
+    _defaults = dict(EventDefaults, nonstandard=None)
+    _default_format = DefaultEventFormat
+
+    @property
+    def text(self) -> str:
+        try:
+            return self._text
+        except AttributeError:
+            return ''
+
+    @text.setter
+    def text(self, text: str):
+        self._text = text
+        self._tokens = None
+        self._karaoke = None
+
+    @property
+    def tokens(self) -> tuple:
+        """
+        Returns
+        -------
+        Out : tuple
+            Override tags and text of 'text', see 'tags.parse_text'.
+            Parsed on first access and kept until 'text' is set again.
+        """
+        tokens = getattr(self, '_tokens', None)
+        if tokens is None:
+            tokens = self._tokens = parse_text(self.text)
+        return tokens
+
+    @tokens.setter
+    def tokens(self, tokens: tuple):
+        self._text = build_text(tokens)
+        self._tokens = tuple(tokens)
+        self._karaoke = None
+
+    @property
+    def karaoke(self) -> Karaoke:
+        """
+        Returns
+        -------
+        Out : Karaoke
+            Syllables of the '\\k', '\\K', '\\kf' and '\\ko' tags, see 'karaoke.parse_karaoke'.
+            Parsed on first access and kept until 'text' is set again.
+        """
+        karaoke = getattr(self, '_karaoke', None)
+        if karaoke is None:
+            karaoke = self._karaoke = parse_karaoke(self.tokens)
+        return karaoke
+
+    @karaoke.setter
+    def karaoke(self, karaoke: Karaoke):
+        """ Write the karaoke tags of 'karaoke' back into 'text', e.g. after 'Karaoke.scaled'. """
+        self.tokens = karaoke.to_tokens()
+        self._karaoke = karaoke
+
+    @property
+    def parsed_effect(self) -> tuple:
+        """ (name, int params) of 'effect', see 'tags.parse_effect'. """
+        return parse_effect(self.effect)
+
+
+class Dialogue(Event):
+    __slots__ = ()
+
+
+class Comment(Event):
+    __slots__ = ()
+
+
+class Picture(Event):
+    __slots__ = ()
+
+
+class Sound(Event):
+    __slots__ = ()
+
+
+class Movie(Event):
+    __slots__ = ()
+
+
+class Command(Event):
+    __slots__ = ()
+
+
+EventTypes = {
+    'Dialogue': Dialogue,
+    'Comment': Comment,
+    'Picture': Picture,
+    'Sound': Sound,
+    'Movie': Movie,
+    'Command': Command
+}
@@ -0,0 +1,147 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Effective style of events and of their text runs, with the inline overrides folded into the style.
+# A resolved style is computed once per (style record, overrides) and shared,
+# so the syllables of a karaoke line, which only differ by '\k', all resolve to the same record.
+
+from typing import Dict, Mapping, Optional, Tuple
+from .records import Style, Event
+from .color import parse_tag_color
+from .tags import TEXT, DRAWING, BLOCK, TAG
+
+# Override tag -> (style attribute, converter of its argument)
+OverrideTags = {
+    'fn': ('font_name', str),
+    'fs': ('font_size', float),
+    'b': ('bold', int),
+    'i': ('italic', int),
+    'u': ('underline', int),
+    's': ('strike_out', int),
+    'c': ('primary_color', parse_tag_color),
+    '1c': ('primary_color', parse_tag_color),
+    '2c': ('secondary_color', parse_tag_color),
+    '3c': ('outline_color', parse_tag_color),
+    '4c': ('background_color', parse_tag_color)
+}
+
+_COLOR_ATTRIBUTES = ('primary_color', 'secondary_color', 'outline_color', 'background_color')
+
+_DEFAULT_STYLE = Style()
+
+
+class StyleResolver:
+    """
+    Resolves the style of events against 'styles', a dict of style name to Style.
+
+    Results are memoized by the identity of the base Style and the overrides in effect,
+    so replacing a style in 'styles' needs no care, while a style changed in place
+    must be followed by 'invalidate'. Resolved styles are shared and must not be changed.
+    """
+
+    def __init__(self, styles: Mapping[str, Style]):
+        self.styles = styles
+        self.__resolved = {}
+
+    def __len__(self):
+        return len(self.__resolved)
+
+    def invalidate(self):
+        """ Forget every resolved style. """
+        self.__resolved.clear()
+
+    def base_style(self, name: str) -> Style:
+        """
+        Returns
+        -------
+        Out : Style
+            The style called 'name', 'Default' when there is none, as renderers fall back.
+        """
+        style = self.styles.get(name)
+        if style is None:
+            style = self.styles.get('Default', _DEFAULT_STYLE)
+        return style
+
+    def resolve(self, base: Style, overrides: Tuple[Tuple[str, object], ...] = ()) -> Style:
+        """
+        Returns
+        -------
+        Out : Style
+            'base' with the (attribute, value) pairs of 'overrides' applied, memoized.
+        """
+        if not overrides:
+            return base
+
+        key = (base, overrides)
+        style = self.__resolved.get(key)
+        if style is None:
+            style = base.copy()
+            for attribute, value in overrides:
+                if attribute in _COLOR_ATTRIBUTES:
+                    # tags set the color only, the alpha of the style stays
+                    value |= getattr(base, attribute) & 0xFF000000
+                setattr(style, attribute, value)
+            self.__resolved[key] = style
+        return style
+
+    def runs(self, event: Event) -> Tuple[Tuple[int, str, Style], ...]:
+        """
+        Returns
+        -------
+        Out : tuple
+            (TEXT or DRAWING, text, effective style) of every run of the event text.
+            '\\r' resets to the event style or the named one, an override without argument
+            goes back to the value of the current base style. '\\t' animations are not applied.
+        """
+        event_style = base = self.base_style(event.style)
+        overrides: Dict[str, object] = {}
+        runs = []
+        for kind, _, value in event.tokens:
+            if kind == BLOCK:
+                for tag_kind, name, args in value:
+                    if tag_kind != TAG:
+                        continue
+                    if name == 'r':
+                        base = self.base_style(args[0]) if args[0] else event_style
+                        overrides.clear()
+                        continue
+
+                    mapping = OverrideTags.get(name)
+                    if mapping is None:
+                        continue
+                    attribute, converter = mapping
+                    overrides.pop(attribute, None)
+                    if args[0]:
+                        try:
+                            overrides[attribute] = converter(args[0])
+                        except ValueError:
+                            continue
+            elif kind == TEXT or kind == DRAWING:
+                runs.append((kind, value, self.resolve(base, tuple(overrides.items()))))
+        return tuple(runs)
+
+    def event_style(self, event: Event) -> Style:
+        """
+        Returns
+        -------
+        Out : Style
+            Effective style at the start of the event text: the first run's, or the base style of an empty event.
+        """
+        runs = self.runs(event)
+        return runs[0][2] if runs else self.base_style(event.style)
+
+    def style_at(self, event: Event, position: int) -> Optional[Style]:
+        """
+        Returns
+        -------
+        Out : Style or None
+            Effective style of the run holding visible character 'position', None past the end.
+        """
+        for _, text, style in self.runs(event):
+            if position < len(text):
+                return style
+            position -= len(text)
+        return None
@@ -0,0 +1,165 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Batched retiming: offset, linear scale (framerate conversion) and snapping to keyframes.
+
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+from fractions import Fraction
+import math
+import pathlib
+from .records import Event
+from .table import EventTable
+from .tags import BLOCK, TAG
+
+# Frame rates written as 23.976 are really 24000/1001
+_NTSC_RATES = {23.976: Fraction(24000, 1001), 29.97: Fraction(30000, 1001), 59.94: Fraction(60000, 1001)}
+
+# Tags whose arguments hold times in milliseconds relative to the event start, by argument position
+_RELATIVE_TIME_ARGS = {
+    't': lambda args: (0, 1) if len(args) >= 3 else (),
+    'move': lambda args: (4, 5) if len(args) == 6 else (),
+    'fad': lambda args: (0, 1) if len(args) == 2 else (),
+    'fade': lambda args: (3, 4, 5, 6) if len(args) == 7 else ()
+}
+
+
+def frame_rate(fps: Union[float, str, Fraction]) -> Fraction:
+    """ Exact frame rate, e.g. 23.976 -> 24000/1001. """
+    fps = float(fps) if isinstance(fps, str) else fps
+    for rate, exact in _NTSC_RATES.items():
+        if abs(fps - rate) < 0.001:
+            return exact
+    return Fraction(fps).limit_denominator(1001)
+
+
+def frame_to_time(frame: int, fps: Union[float, Fraction]) -> int:
+    """ Start time of 'frame' in centiseconds, rounded to the nearest. """
+    return math.floor(Fraction(frame * 100) / frame_rate(fps) + Fraction(1, 2))
+
+
+def load_keyframes(keyframes: Union[str, pathlib.Path, Iterable[str]]) -> Tuple[List[int], Optional[Fraction]]:
+    """
+    Read keyframe frame numbers.
+
+    Parameters
+    ----------
+    keyframes : str, Path or iterable of str
+        A path or the lines of an Aegisub keyframe file ('# keyframe format v1' with an 'fps' line),
+        a XviD 2-pass stats file (frames marked 'i' are keyframes) or plain frame numbers.
+
+    Returns
+    -------
+    Out : tuple
+        (sorted frame numbers, frame rate or None when the file has none).
+    """
+    if isinstance(keyframes, (str, pathlib.Path)):
+        keyframes = pathlib.Path(keyframes).read_text(encoding='utf-8', errors='replace').splitlines()
+
+    lines = iter(keyframes)
+    first = next(lines, '').strip().lower()
+    frames, fps = [], None
+
+    if 'xvid' in first:
+        index = 0
+        for line in lines:
+            line = line.strip()
+            if line and line[0] in 'ipbsIPBS':
+                if line[0] in 'iI':
+                    frames.append(index)
+                index += 1
+        return frames, fps
+
+    if not first.startswith('#'):
+        lines = iter([first] + list(lines))
+    for line in lines:
+        line = line.strip()
+        if line.lower().startswith('fps'):
+            rate = float(line[3:].strip() or 0)
+            fps = frame_rate(rate) if rate > 0 else None
+        elif line and not line.startswith('#'):
+            frames.append(int(line))
+    return sorted(frames), fps
+
+
+def _scale_tags(event: Event, factor: float):
+    tokens = []
+    for kind, name, value in event.tokens:
+        if kind == BLOCK:
+            value = tuple(
+                (tag_kind, tag_name, _scale_args(tag_name, args, factor) if tag_kind == TAG else args)
+                for tag_kind, tag_name, args in value
+            )
+        tokens.append((kind, name, value))
+    event.tokens = tokens
+
+
+def _scale_args(name: str, args: tuple, factor: float) -> tuple:
+    positions = _RELATIVE_TIME_ARGS.get(name)
+    if positions is None:
+        return args
+
+    args = list(args)
+    for position in positions(args):
+        try:
+            args[position] = str(math.floor(float(args[position]) * factor + 0.5))
+        except (IndexError, ValueError):
+            continue
+    return tuple(args)
+
+
+def retime(
+        events: Sequence[Event],
+        offset: int = 0,
+        scale: float = 1.0,
+        origin: int = 0,
+        keyframes: Optional[Sequence[int]] = None,
+        fps: Union[float, Fraction, None] = None,
+        max_distance: int = 25,
+        rewrite_tags: bool = False
+) -> List[Event]:
+    """
+    Retime all events in one batch: scale around 'origin', shift by 'offset', then snap to keyframes.
+
+    Parameters
+    ----------
+    events : sequence
+        Records changed in place.
+    offset : int
+        Centiseconds added to every time.
+    scale : float
+        Time factor 'source_fps / target_fps', e.g. (24000 / 1001) / 25 for a 23.976 fps release sped up to 25 fps.
+    keyframes : sequence of int, optional
+        Keyframe frame numbers, see 'load_keyframes'.
+    fps : float, optional
+        Frame rate of 'keyframes', required with them.
+    max_distance : int
+        Starts and ends farther than this many centiseconds from a keyframe are left alone.
+    rewrite_tags : bool
+        Also scale the relative millisecond times of '\\t', '\\move', '\\fad' and '\\fade'.
+
+    Returns
+    -------
+    Out : list
+        The retimed events.
+    """
+    table = EventTable(events)
+    if scale != 1:
+        table.scale(scale, origin)
+    if offset:
+        table.shift(offset)
+
+    if keyframes:
+        if fps is None:
+            raise ValueError('fps is required to snap to keyframes')
+        table.snap(sorted(frame_to_time(frame, fps) for frame in keyframes), max_distance)
+
+    # every tag is rewritten before any time is written back
+    if rewrite_tags and scale != 1:
+        for event in events:
+            text = event.text
+            if '\\t' in text or '\\move' in text or '\\fad' in text:
+                _scale_tags(event, scale)
+    return table.apply()
@@ -0,0 +1,95 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+from typing import Union, Iterable, Iterator
+from contextlib import contextmanager
+import io
+import pathlib
+import _io
+import os.path
+from .charset import AUTO, SNIFF_SIZE, detect_encoding
+from .tokenizer import tokenize, normalize_name, parse_format, SECTION, FORMAT, ENTRY
+from .records import Event, EventTypes, DefaultEventFormat
+
+
+def split_lines(content: str) -> Iterator[str]:
+    """
+    Lines of 'content' split as an opened text file splits them: on '\\n', '\\r\\n' and '\\r' only,
+    unlike 'str.splitlines', which also splits on '\\x0c', '\\x1c'-'\\x1e', '\\x85', '\\u2028' and '\\u2029'.
+    """
+    return iter(io.StringIO(content.lstrip('\ufeff'), newline=None))
+
+
+@contextmanager
+def open_lines(
+        ass: Union[str, bytes, pathlib.Path, _io.TextIOWrapper, _io.BufferedReader],
+        encoding: str = 'utf-8-sig'
+) -> Iterator[Iterable[str]]:
+    """
+    Give the lines of a path, an opened file, the script content itself or its raw bytes.
+
+    Files are iterated line by line and closed on exit, so the whole content is never read at once.
+    With encoding 'auto' the encoding of bytes, binary files and paths is detected from
+    the first 'charset.SNIFF_SIZE' bytes, which are peeked at rather than read twice.
+    """
+    if isinstance(ass, str):
+        if os.path.exists(ass):
+            ass = pathlib.Path(ass)
+        else:
+            yield split_lines(ass)
+            return
+    if isinstance(ass, (bytes, bytearray, memoryview)):
+        if encoding == AUTO:
+            encoding = detect_encoding(ass[:SNIFF_SIZE])
+        yield split_lines(str(ass, encoding))
+        return
+    if isinstance(ass, pathlib.Path):
+        if encoding == AUTO:
+            ass = open(ass, 'rb', buffering=SNIFF_SIZE)
+        else:
+            ass = open(ass, 'r', encoding=encoding)
+    if isinstance(ass, _io.BufferedReader):
+        if encoding == AUTO:
+            encoding = detect_encoding(ass.peek(SNIFF_SIZE))
+        ass = io.TextIOWrapper(ass, encoding=encoding)
+
+    with ass:
+        yield ass
+
+
+def iter_events(
+        ass: Union[str, bytes, pathlib.Path, _io.TextIOWrapper, _io.BufferedReader],
+        encoding: str = 'utf-8-sig'
+) -> Iterator[Event]:
+    """
+    Yield the events of a script one at a time in constant memory.
+
+    Parameters
+    ----------
+    ass : str, bytes, Path or opened file
+        Path, content or raw bytes of the script.
+    encoding : str
+        Encoding used when 'ass' is a path or bytes, 'auto' to detect it.
+
+    Returns
+    -------
+    Out : iterator
+        'Dialogue', 'Comment', ... records built with the current 'Format:' line of '[Events]'.
+    """
+    with open_lines(ass, encoding) as lines:
+        in_events = False
+        event_format = DefaultEventFormat
+        for kind, key, value in tokenize(lines):
+            if kind == SECTION:
+                in_events = normalize_name(key) == 'events'
+            elif not in_events:
+                continue
+            elif kind == ENTRY:
+                event_type = EventTypes.get(key)
+                if event_type is not None:
+                    yield event_type(value, event_format)
+            elif kind == FORMAT:
+                event_format = parse_format(value)
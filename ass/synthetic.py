@@ -0,0 +1,110 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Deterministic generator of large synthetic scripts for benchmarks.
+
+from typing import Iterator, Union
+import pathlib
+import random
+from .records import DefaultStyleFormat, DefaultEventFormat
+from .timestamp import format_time
+
+_LATIN_WORDS = (
+    'the', 'night', 'before', 'christmas', 'party', 'snow', 'light', 'promise',
+    'remember', 'always', 'together', 'tomorrow', 'quiet', 'station', 'window'
+)
+_CJK_CHARS = 'あいうえおかきくけこさしすせそ今日明日雪夜空光约定记忆永远一起车站窗户'
+
+
+def _text(rng: random.Random, tags: bool, cjk: bool) -> str:
+    if cjk and rng.random() < 0.5:
+        words = [''.join(rng.choice(_CJK_CHARS) for _ in range(rng.randint(2, 5))) for _ in range(rng.randint(2, 6))]
+    else:
+        words = [rng.choice(_LATIN_WORDS) for _ in range(rng.randint(3, 9))]
+
+    if not tags:
+        return ' '.join(words)
+
+    kind = rng.random()
+    if kind < 0.4:
+        # karaoke line, one \k per syllable
+        return '{\\fad(150,150)}' + ''.join('{\\k%d}%s' % (rng.randint(10, 60), word) for word in words)
+    if kind < 0.7:
+        return '{\\pos(%d,%d)\\fs%d\\c&H%06X&\\t(0,%d,\\fscx120\\fscy120)}%s' % (
+            rng.randint(0, 1920), rng.randint(0, 1080), rng.randint(30, 80),
+            rng.randint(0, 0xFFFFFF), rng.randint(100, 900), ' '.join(words)
+        )
+    if kind < 0.8:
+        points = ' '.join('%d %d' % (rng.randint(0, 400), rng.randint(0, 400)) for _ in range(rng.randint(8, 40)))
+        return '{\\an7\\move(0,0,%d,%d)\\p1}m 0 0 l %s{\\p0}' % (rng.randint(0, 1920), rng.randint(0, 1080), points)
+    return ' '.join(words)
+
+
+def generate(
+        events: int = 10000,
+        styles: int = 20,
+        tags: bool = True,
+        cjk: bool = True,
+        newline: str = '\n',
+        seed: int = 0
+) -> Iterator[str]:
+    """
+    Yield the lines of a synthetic script, each ending with 'newline'.
+
+    Parameters
+    ----------
+    events : int
+        Number of Dialogue/Comment lines.
+    styles : int
+        Number of styles, events pick one at random.
+    tags : bool
+        Add override tags: karaoke '\\k', '\\pos', '\\t', drawings.
+    cjk : bool
+        Mix Japanese and Chinese text into the events.
+    newline : str
+        '\\n' or '\\r\\n'.
+    seed : int
+        The same arguments and seed always give the same script.
+    """
+    rng = random.Random(seed)
+    style_names = ['Default'] + ['Style%03d' % index for index in range(1, styles)]
+
+    yield '[Script Info]' + newline
+    yield 'Title: synthetic %d events' % events + newline
+    yield 'ScriptType: v4.00+' + newline
+    yield 'PlayResX: 1920' + newline
+    yield 'PlayResY: 1080' + newline
+    yield newline
+
+    yield '[V4+ Styles]' + newline
+    yield 'Format: ' + ', '.join(DefaultStyleFormat) + newline
+    for name in style_names:
+        yield 'Style: %s,Arial,%d,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,%d,10,10,10,1' % (
+            name, rng.randint(20, 80), rng.randint(1, 9)
+        ) + newline
+    yield newline
+
+    yield '[Events]' + newline
+    yield 'Format: ' + ', '.join(DefaultEventFormat) + newline
+    start = 0
+    for _ in range(events):
+        start += rng.randint(0, 300)
+        end = start + rng.randint(50, 600)
+        yield '%s: %d,%s,%s,%s,,0,0,0,,%s' % (
+            'Comment' if rng.random() < 0.05 else 'Dialogue',
+            rng.randint(0, 3), format_time(start), format_time(end),
+            rng.choice(style_names), _text(rng, tags, cjk)
+        ) + newline
+
+
+def write_script(path: Union[str, pathlib.Path], encoding: str = 'utf-8', **kwargs) -> pathlib.Path:
+    """
+    Write 'generate(**kwargs)' to 'path'.
+    """
+    path = pathlib.Path(path)
+    with open(path, 'w', encoding=encoding, newline='') as file:
+        file.writelines(generate(**kwargs))
+    return path
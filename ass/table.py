@@ -0,0 +1,215 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Columnar view over events for bulk timing operations.
+# NumPy is used when installed, otherwise the columns fall back to 'array.array'
+# and the same operations run as comprehensions.
+
+from typing import Iterable, List, Optional, Sequence
+from array import array
+from itertools import compress
+from bisect import bisect_left
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .records import Event
+
+IntColumns = ('start', 'end', 'layer', 'margin_l', 'margin_r', 'margin_v')
+
+
+def _column(values: Iterable[int]):
+    if numpy is not None:
+        return numpy.fromiter(values, dtype=numpy.int64)
+    return array('q', values)
+
+
+def _nearest(column, times: Sequence[int], max_distance: int) -> list:
+    """ Nearest of the sorted 'times' to every value within 'max_distance', the earlier one on ties. """
+    nearest = []
+    last = len(times) - 1
+    for value in column:
+        index = bisect_left(times, value)
+        lower = times[max(index - 1, 0)]
+        upper = times[min(index, last)]
+        best = lower if abs(value - lower) <= abs(upper - value) else upper
+        nearest.append(best if abs(best - value) <= max_distance else value)
+    return nearest
+
+
+class EventTable:
+    """
+    Events stored as parallel integer columns.
+
+    Times are integer centiseconds, styles are indices into 'style_names'.
+    'index' maps every row back to its record in 'events', so results can be written back with 'apply'.
+    """
+
+    def __init__(self, events: Sequence[Event]):
+        self.events = events
+        self.style_names = []
+        self.__style_indices = {}
+
+        self.index = _column(range(len(events)))
+        for name in IntColumns:
+            setattr(self, name, _column(getattr(event, name) for event in events))
+        self.style = _column(self.style_index(event.style) for event in events)
+
+    def __len__(self):
+        return len(self.index)
+
+    def style_index(self, style_name: str) -> int:
+        """
+        Returns
+        -------
+        Out : int
+            Interned index of the style name, added to 'style_names' when it is new.
+        """
+        index = self.__style_indices.get(style_name)
+        if index is None:
+            index = self.__style_indices[style_name] = len(self.style_names)
+            self.style_names.append(style_name)
+        return index
+
+    def shift(self, offset: int) -> 'EventTable':
+        """
+        Move every event by 'offset' centiseconds in place.
+        """
+        if numpy is not None:
+            self.start += offset
+            self.end += offset
+        else:
+            self.start = array('q', [value + offset for value in self.start])
+            self.end = array('q', [value + offset for value in self.end])
+        return self
+
+    def scale(self, factor: float, origin: int = 0) -> 'EventTable':
+        """
+        Stretch every time around 'origin' in place, rounding to the nearest centisecond.
+
+        Use 'source_fps / target_fps' as factor to convert between framerates,
+        e.g. (24000 / 1001) / 25 for a 23.976 fps release sped up to 25 fps.
+        """
+        if numpy is not None:
+            self.start = numpy.floor((self.start - origin) * factor + origin + 0.5).astype(numpy.int64)
+            self.end = numpy.floor((self.end - origin) * factor + origin + 0.5).astype(numpy.int64)
+        else:
+            self.start = array('q', [math.floor((value - origin) * factor + origin + 0.5) for value in self.start])
+            self.end = array('q', [math.floor((value - origin) * factor + origin + 0.5) for value in self.end])
+        return self
+
+    def snap(self, times: Sequence[int], max_distance: int) -> 'EventTable':
+        """
+        Move starts and ends to the nearest of the sorted 'times' in place, found by binary search.
+
+        Times farther than 'max_distance' centiseconds are left alone,
+        and an event that would become empty keeps its original times.
+        """
+        if not len(times):
+            return self
+
+        if numpy is not None:
+            times = numpy.asarray(times, dtype=numpy.int64)
+            last = len(times) - 1
+
+            def nearest(column):
+                index = numpy.searchsorted(times, column)
+                lower = times[numpy.clip(index - 1, 0, last)]
+                upper = times[numpy.clip(index, 0, last)]
+                best = numpy.where(numpy.abs(column - lower) <= numpy.abs(upper - column), lower, upper)
+                return numpy.where(numpy.abs(best - column) <= max_distance, best, column)
+
+            start, end = nearest(self.start), nearest(self.end)
+            keep = end > start
+            self.start = numpy.where(keep, start, self.start)
+            self.end = numpy.where(keep, end, self.end)
+        else:
+            start, end = _nearest(self.start, times, max_distance), _nearest(self.end, times, max_distance)
+            keep = [new_end > new_start for new_start, new_end in zip(start, end)]
+            self.start = array('q', [new if flag else old for new, old, flag in zip(start, self.start, keep)])
+            self.end = array('q', [new if flag else old for new, old, flag in zip(end, self.end, keep)])
+        return self
+
+    def filter(
+            self,
+            mask: Optional[Sequence[bool]] = None,
+            styles: Optional[Iterable[str]] = None,
+            layers: Optional[Iterable[int]] = None
+    ) -> 'EventTable':
+        """
+        Returns
+        -------
+        Out : EventTable
+            A new table with the rows kept by 'mask' whose style and layer are in 'styles' and 'layers'.
+        """
+        keep = [True] * len(self) if mask is None else list(mask)
+        if styles is not None:
+            style_indices = {self.__style_indices[name] for name in styles if name in self.__style_indices}
+            keep = [flag and style in style_indices for flag, style in zip(keep, self.style)]
+        if layers is not None:
+            layers = set(layers)
+            keep = [flag and layer in layers for flag, layer in zip(keep, self.layer)]
+        return self.__select(keep)
+
+    def clip(self, start: Optional[int] = None, end: Optional[int] = None) -> 'EventTable':
+        """
+        Returns
+        -------
+        Out : EventTable
+            A new table with events clamped into [start, end], events fully outside the range are dropped.
+        """
+        low = -math.inf if start is None else start
+        high = math.inf if end is None else end
+        if numpy is not None:
+            table = self.__select((self.end > low) & (self.start < high))
+            table.start = numpy.maximum(table.start, low) if start is not None else table.start
+            table.end = numpy.minimum(table.end, high) if end is not None else table.end
+        else:
+            table = self.__select([
+                event_end > low and event_start < high for event_start, event_end in zip(self.start, self.end)
+            ])
+            if start is not None:
+                table.start = array('q', [max(value, start) for value in table.start])
+            if end is not None:
+                table.end = array('q', [min(value, end) for value in table.end])
+        return table
+
+    def apply(self) -> List[Event]:
+        """
+        Write the columns back into the records.
+
+        Returns
+        -------
+        Out : list
+            The records of the rows in this table.
+        """
+        events = []
+        for row, event_start, event_end, layer, margin_l, margin_r, margin_v, style in zip(
+                self.index, self.start, self.end, self.layer,
+                self.margin_l, self.margin_r, self.margin_v, self.style
+        ):
+            event = self.events[row]
+            event.start, event.end, event.layer = int(event_start), int(event_end), int(layer)
+            event.margin_l, event.margin_r, event.margin_v = int(margin_l), int(margin_r), int(margin_v)
+            event.style = self.style_names[style]
+            events.append(event)
+        return events
+
+    def __select(self, mask) -> 'EventTable':
+        table = EventTable.__new__(EventTable)
+        table.events = self.events
+        table.style_names = self.style_names
+        table.__style_indices = self.__style_indices
+        for name in ('index', 'style') + IntColumns:
+            column = getattr(self, name)
+            if numpy is not None:
+                setattr(table, name, column[numpy.asarray(mask, dtype=bool)])
+            else:
+                setattr(table, name, array('q', compress(column, mask)))
+        return table
@@ -0,0 +1,200 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Parser of override blocks ('{\pos(10,20)\fs50}') and of the Effect column.
+#
+# Text is parsed into a flat tuple of tokens:
+#     (TEXT, '', text)          plain text
+#     (DRAWING, '', commands)   text while drawing mode '\p' is on
+#     (BLOCK, source, tags)     one '{...}' block, tags is a tuple of
+#         (TAG, name, args)     args is a tuple of stripped str, '\t' appends the tuple of its inner tags
+#         (COMMENT, '', text)   anything in a block that is not a tag
+#
+# 'source' is the text of the block as parsed, written back as long as its tags are unchanged,
+# so that the spaces around arguments survive. Blocks of new or changed tags are written normalized.
+
+from typing import Iterator, Tuple
+from functools import lru_cache
+import re
+
+TEXT = 0
+DRAWING = 1
+BLOCK = 2
+TAG = 3
+COMMENT = 4
+
+Token = Tuple[int, str, object]
+
+# Longer names first, so that '\fscx' is not read as '\fs' with argument 'cx'.
+TagNames = (
+    'xbord', 'ybord', 'xshad', 'yshad', 'alpha', 'iclip',
+    'blur', 'bord', 'clip', 'fade', 'fscx', 'fscy', 'move', 'shad',
+    'fad', 'fax', 'fay', 'fsp', 'frx', 'fry', 'frz', 'org', 'pbo', 'pos',
+    '1c', '2c', '3c', '4c', '1a', '2a', '3a', '4a',
+    'an', 'be', 'fe', 'fn', 'fr', 'fs', 'kf', 'ko', 'kt',
+    'a', 'b', 'c', 'i', 'k', 'K', 'p', 'q', 'r', 's', 't', 'u'
+)
+
+_TAG_NAME = re.compile('|'.join(TagNames))
+
+
+def _find_close(block: str, position: int) -> int:
+    """ Index of the ')' closing the '(' at 'position', or the end of 'block'. """
+    depth = 0
+    for index in range(position, len(block)):
+        char = block[index]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if not depth:
+                return index
+    return len(block)
+
+
+@lru_cache(maxsize=4096)
+def parse_block(block: str) -> Tuple[Token, ...]:
+    """
+    Parameters
+    ----------
+    block : str
+        Content of one override block without the braces.
+
+    Returns
+    -------
+    Out : tuple
+        TAG and COMMENT tokens.
+    """
+    tokens = []
+    position, length = 0, len(block)
+    while position < length:
+        slash = block.find('\\', position)
+        if slash < 0:
+            tokens.append((COMMENT, '', block[position:]))
+            break
+        if slash > position:
+            tokens.append((COMMENT, '', block[position:slash]))
+
+        match = _TAG_NAME.match(block, slash + 1)
+        name = match.group() if match else ''
+        position = slash + 1 + len(name)
+
+        if position < length and block[position] == '(':
+            close = _find_close(block, position)
+            inner = block[position + 1:close]
+            position = close + 1
+            if name == 't':
+                split = inner.find('\\')
+                if split < 0:
+                    split = len(inner)
+                args = tuple(arg.strip() for arg in inner[:split].split(',') if arg.strip())
+                args += (parse_block(inner[split:]),)
+            else:
+                args = tuple(arg.strip() for arg in inner.split(','))
+        else:
+            next_slash = block.find('\\', position)
+            if next_slash < 0:
+                next_slash = length
+            args = (block[position:next_slash].strip(),)
+            position = next_slash
+
+        tokens.append((TAG, name, args))
+    return tuple(tokens)
+
+
+def parse_text(text: str) -> Tuple[Token, ...]:
+    """
+    Parameters
+    ----------
+    text : str
+        The Text column of an event.
+
+    Returns
+    -------
+    Out : tuple
+        TEXT, DRAWING and BLOCK tokens in order.
+    """
+    tokens = []
+    drawing = False
+    position, length = 0, len(text)
+    while position < length:
+        opening = text.find('{', position)
+        closing = text.find('}', opening) if opening >= 0 else -1
+        if closing < 0:
+            opening = closing = length
+
+        if opening > position:
+            tokens.append((DRAWING if drawing else TEXT, '', text[position:opening]))
+        if closing < length:
+            source = text[opening + 1:closing]
+            tags = parse_block(source)
+            tokens.append((BLOCK, source, tags))
+            for kind, name, args in tags:
+                if kind == TAG and name == 'p':
+                    drawing = args[0].isdigit() and int(args[0]) > 0
+        position = closing + 1
+    return tuple(tokens)
+
+
+def _build_tag(name: str, args: tuple) -> str:
+    if name == 't':
+        return '\\t(' + ''.join([arg + ',' for arg in args[:-1]]) + build_block(args[-1]) + ')'
+    if len(args) > 1 or name in ('pos', 'move', 'org', 'fad', 'fade', 'clip', 'iclip'):
+        return '\\' + name + '(' + ','.join(args) + ')'
+    return '\\' + name + args[0]
+
+
+def build_block(tags: Tuple[Token, ...]) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        Text of TAG and COMMENT tokens, without the braces.
+    """
+    return ''.join([_build_tag(name, args) if kind == TAG else args for kind, name, args in tags])
+
+
+def build_text(tokens: Tuple[Token, ...]) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        The Text column represented by the tokens of 'parse_text'.
+    """
+    return ''.join([
+        value if kind != BLOCK else '{' + (source if parse_block(source) == value else build_block(value)) + '}'
+        for kind, source, value in tokens
+    ])
+
+
+def iter_tags(tokens: Tuple[Token, ...]) -> Iterator[Tuple[str, tuple]]:
+    """
+    Returns
+    -------
+    Out : iterator
+        (name, args) of every top level tag in every block.
+    """
+    for kind, _, value in tokens:
+        if kind == BLOCK:
+            for tag_kind, name, args in value:
+                if tag_kind == TAG:
+                    yield name, args
+
+
+def parse_effect(effect: str) -> Tuple[str, Tuple[int, ...]]:
+    """
+    Parameters
+    ----------
+    effect : str
+        The Effect column, e.g. 'Scroll up;100;200;10' or 'Banner;5;0;0'.
+
+    Returns
+    -------
+    Out : tuple
+        (name, params) with the numeric parameters as int, ('', ()) when empty.
+    """
+    name, *params = effect.split(';')
+    return name.strip(), tuple(int(param) for param in params if param.strip().lstrip('-').isdigit())
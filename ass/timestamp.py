@@ -0,0 +1,77 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Codec between 'H:MM:SS.cc' and integer centiseconds.
+# Integers keep the round trip lossless, there is no float arithmetic anywhere.
+
+from typing import Iterable
+from array import array
+from .errors import ASSFileError
+
+# '%02d:%02d' of every minute and second below an hour, and '%02d' of every centisecond,
+# with the reverse lookups used by the parser instead of int()
+_MINUTE_SECOND = tuple('%02d:%02d' % divmod(second, 60) for second in range(3600))
+_CENTISECOND = tuple('%02d' % centisecond for centisecond in range(100))
+_MINUTE_SECOND_VALUES = {text: second * 100 for second, text in enumerate(_MINUTE_SECOND)}
+_CENTISECOND_VALUES = {text: centisecond for centisecond, text in enumerate(_CENTISECOND)}
+
+
+def parse_time(text: str) -> int:
+    """
+    Parameters
+    ----------
+    text : str
+        'H:MM:SS.cc'. Hours may have any number of digits, a fraction of one digit is read as tenths
+        and digits after the second one are dropped.
+
+    Returns
+    -------
+    Out : int
+        Centiseconds.
+    """
+    colon = text.find(':')
+    if colon > 0 and len(text) == colon + 9 and text[colon + 6] == '.':
+        # the layout of every line written by Aegisub, read with slices and table lookups only
+        minute_second = _MINUTE_SECOND_VALUES.get(text[colon + 1:colon + 6])
+        centisecond = _CENTISECOND_VALUES.get(text[colon + 7:])
+        if minute_second is not None and centisecond is not None:
+            return int(text[:colon]) * 360000 + minute_second + centisecond
+
+    try:
+        hour, minute, second = text.strip().split(':')
+        second, _, fraction = second.partition('.')
+        return ((int(hour) * 60 + int(minute)) * 60 + int(second)) * 100 + int((fraction + '00')[:2])
+    except ValueError:
+        raise ASSFileError('Invalid time: {!r}'.format(text)) from None
+
+
+def format_time(centiseconds: int) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        'H:MM:SS.cc', negative times are clamped to '0:00:00.00'.
+    """
+    if centiseconds <= 0:
+        return '0:00:00.00'
+
+    second, centisecond = divmod(centiseconds, 100)
+    hour, second = divmod(second, 3600)
+    return '%d:%s.%s' % (hour, _MINUTE_SECOND[second], _CENTISECOND[centisecond])
+
+
+def parse_times(texts: Iterable[str]) -> array:
+    """
+    Returns
+    -------
+    Out : array
+        Centiseconds of every text as a signed 64-bit array.
+    """
+    return array('q', map(parse_time, texts))
+
+
+def format_times(values: Iterable[int]) -> list:
+    return list(map(format_time, values))
@@ -0,0 +1,95 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Classify every line of an SSA/ASS file exactly once.
+# Only plain prefix checks and a single 'str.partition' are used per line,
+# so no regular expression is run on the hot path.
+
+from typing import Iterable, Iterator, Tuple
+
+BLANK = 0
+COMMENT = 1
+SECTION = 2
+FORMAT = 3
+ENTRY = 4
+UNKNOWN = 5
+
+Token = Tuple[int, str, str]
+
+_COMMENT_PREFIXES = (';', '!')
+
+
+def classify(line: str) -> Token:
+    """
+    Classify one line.
+
+    Parameters
+    ----------
+    line : str
+        A raw line, with or without the line ending.
+
+    Returns
+    -------
+    Out : tuple
+        (kind, key, value).
+        SECTION gives the section name as key, ENTRY and FORMAT give the text
+        before and after the first colon, the others give the stripped line as value.
+    """
+    line = line.strip()
+    if not line:
+        return BLANK, '', ''
+
+    first = line[0]
+    if first == '[' and line[-1] == ']':
+        return SECTION, line[1:-1], ''
+    if first in _COMMENT_PREFIXES:
+        return COMMENT, '', line
+
+    key, colon, value = line.partition(':')
+    if not colon:
+        return UNKNOWN, '', line
+
+    key = key.rstrip()
+    if key == 'Format':
+        return FORMAT, key, value.lstrip()
+    return ENTRY, key, value.lstrip()
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[Token]:
+    """
+    Lazily classify lines.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Lines of an SSA file, such as an opened text file.
+
+    Returns
+    -------
+    Out : iterator
+        One token per line, see 'classify'.
+    """
+    return map(classify, lines)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Returns
+    -------
+    Out : str
+        Lower-cased name without spaces, e.g. 'V4+ Styles' -> 'v4+styles'.
+    """
+    return name.replace(' ', '').lower()
+
+
+def parse_format(value: str) -> tuple:
+    """
+    Returns
+    -------
+    Out : tuple
+        Column names of a 'Format:' line value, spelled and ordered as in the file.
+    """
+    return tuple(column.strip() for column in value.split(','))
@@ -0,0 +1,87 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+from typing import Iterable, Iterator, TextIO
+from .attachments import NamePrefixes
+
+CHUNK_SIZE = 1 << 16
+
+
+def iter_lines(ass) -> Iterator[str]:
+    """
+    Serialize a parsed script line by line.
+
+    Parameters
+    ----------
+    ass : ASS
+        The parsed script.
+
+    Returns
+    -------
+    Out : iterator
+        Lines with their line endings: '[Script Info]', the nonstandard sections, '[V4+ Styles]',
+        '[Fonts]', '[Graphics]' and '[Events]', each 'Format:' line in its original column order.
+    """
+    yield '[Script Info]\n'
+    for key, value in ass.script_info.items():
+        yield '{}: {}\n'.format(key, value)
+
+    for section_name, lines in ass.nonstandard_sections.items():
+        yield '\n[{}]\n'.format(section_name)
+        for line in lines:
+            yield line + '\n'
+
+    style_format = ass.style_format
+    yield '\n[V4+ Styles]\n'
+    yield 'Format: {}\n'.format(', '.join(style_format))
+    for style in ass.styles.values():
+        yield 'Style: ' + style.to_row(style_format) + '\n'
+
+    for section_name, attachments in (('Fonts', ass.fonts), ('Graphics', ass.graphics)):
+        if attachments:
+            yield '\n[{}]\n'.format(section_name)
+            prefix = NamePrefixes[section_name.lower()]
+            for attachment in attachments:
+                yield from attachment.iter_lines(prefix)
+
+    yield from iter_event_lines(ass.events, ass.event_format)
+
+
+def iter_event_lines(events: Iterable, event_format: tuple) -> Iterator[str]:
+    """
+    Returns
+    -------
+    Out : iterator
+        The '[Events]' section of 'events', which may be a lazy stream such as 'iter_events'.
+    """
+    yield '\n[Events]\n'
+    yield 'Format: {}\n'.format(', '.join(event_format))
+    for event in events:
+        yield type(event).__name__ + ': ' + event.to_row(event_format) + '\n'
+
+
+def write_lines(lines: Iterable[str], file: TextIO, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Write lines in chunks of about 'chunk_size' characters.
+
+    Returns
+    -------
+    Out : int
+        Number of characters written.
+    """
+    chunk, chunk_length, written = [], 0, 0
+    for line in lines:
+        chunk.append(line)
+        chunk_length += len(line)
+        if chunk_length >= chunk_size:
+            file.write(''.join(chunk))
+            written += chunk_length
+            chunk, chunk_length = [], 0
+
+    if chunk:
+        file.write(''.join(chunk))
+        written += chunk_length
+    return written
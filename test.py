@@ -0,0 +1,838 @@
+# encoding: utf-8
+
+# Author: syxxzzr
+# Email: syxxzzr@163.com / syxxzzr@gmail.com
+# License: Apache 2.0
+
+# Run with 'python -m pytest test.py' or 'python -m unittest test'.
+
+import codecs
+import contextlib
+from fractions import Fraction
+import io
+import pathlib
+import pickle
+import random
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+from ass import ASS, merge_documents, find_collisions
+from ass import table
+from ass.attachments import Attachment, decode, encode, decoded_size, read_attachments
+from ass.cache import ParseCache
+from ass.charset import detect_encoding
+from ass.color import (
+    parse_color, format_color, parse_colors, format_colors, parse_tag_color, format_tag_color, parse_tag_alpha,
+    format_tag_alpha, with_alpha, pack, unpack
+)
+from ass.convert import FORMATS, OutOfOrderError, convert_file, iter_cues, iter_subtitles, main as convert_main
+from ass.document import Document
+from ass.errors import ASSFileError
+from ass.interval import IntervalIndex
+from ass.karaoke import karaoke_events, scale_karaoke, syllable_table
+from ass.mapped import MappedASS
+from ass.profiling import ParseProfiler, add_hook, remove_hook
+from ass.records import Dialogue, Comment, Style, DefaultEventFormat
+from ass.resolve import StyleResolver
+from ass.retime import retime, load_keyframes
+from ass.stream import iter_events
+from ass.tags import TAG, parse_text, build_text, iter_tags
+from ass.timestamp import parse_time, format_time
+
+SAMPLE = pathlib.Path(__file__).with_name('test.ass')
+
+
+def snapshot(ass: ASS) -> tuple:
+    """ Everything parsed from a script, comparable with '=='. """
+    return (
+        ass.script_info,
+        {name: style.to_row(ass.style_format) for name, style in ass.styles.items()},
+        [(type(event).__name__, event.to_row(ass.event_format)) for event in ass.events],
+        ass.style_format,
+        ass.event_format,
+        ass.nonstandard_sections,
+        [(attachment.name, len(attachment)) for attachment in ass.fonts + ass.graphics]
+    )
+
+
+class TestTime(unittest.TestCase):
+
+    def test_round_trip(self):
+        for centiseconds in [0, 1, 99, 100, 5999, 6000, 359999, 360000, 123456789] + list(range(0, 400000, 997)):
+            self.assertEqual(parse_time(format_time(centiseconds)), centiseconds)
+
+    def test_loose_layouts(self):
+        self.assertEqual(parse_time('0:00:01.5'), 150)
+        self.assertEqual(parse_time('10:00:00.00'), 3600000)
+        self.assertEqual(parse_time(' 0:01:02.034 '), 6203)
+        self.assertRaises(ASSFileError, parse_time, '0:00')
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_decoder(self):
+        event = Dialogue(' 1,0:00:01.50,0:01:00.00, JP ,Bob,0010,20,0,fx,{\\b1} a, b ', DefaultEventFormat)
+        self.assertEqual(
+            (event.layer, event.start, event.end, event.style, event.speaker_name),
+            (1, 150, 6000, 'JP', 'Bob')
+        )
+        self.assertEqual((event.margin_l, event.margin_r, event.margin_v, event.effect), (10, 20, 0, 'fx'))
+        # the text is kept verbatim, commas and spaces included
+        self.assertEqual(event.text, '{\\b1} a, b ')
+        self.assertEqual(event.to_row(DefaultEventFormat), '1,0:00:01.50,0:01:00.00,JP,Bob,10,20,0,fx,{\\b1} a, b ')
+        self.assertIs(Dialogue._decoder(DefaultEventFormat), Dialogue._decoder(DefaultEventFormat))
+
+    def test_other_formats(self):
+        row_format = ('Text', 'End', 'Actor', 'Start')
+        event = Dialogue('a,0:00:02.00, someone ,0:00:01.00', row_format, start=5, layer=3)
+        # columns of the row win over keywords, which win over the defaults
+        self.assertEqual((event.text, event.start, event.end, event.layer), ('a', 100, 200, 3))
+        self.assertEqual((event.style, event.margin_l, event.nonstandard), ('Default', 0, {'Actor': 'someone'}))
+        self.assertEqual(event.to_row(row_format), 'a,0:00:02.00,someone,0:00:01.00')
+        self.assertEqual(event.to_row(), '3,0:00:01.00,0:00:02.00,Default,,0,0,0,,a')
+
+        style = Style('X,Arial,20.5,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,'
+                      '-1,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1')
+        self.assertEqual((style.name, style.font_size, style.bold, style.background_color), ('X', 20.5, -1, 0x80000000))
+        self.assertEqual(Style(style.to_row()).to_dict(), style.to_dict())
+
+    def test_column_count(self):
+        with self.assertRaises(ASSFileError) as raised:
+            Dialogue('0,0:00:01.00,0:00:02.00', DefaultEventFormat)
+        self.assertEqual(str(raised.exception), "Expect 10 columns but got 3: '0,0:00:01.00,0:00:02.00'")
+        with self.assertRaises(ASSFileError):
+            Style('X,Arial')
+        self.assertRaises(ValueError, Dialogue, 'x,0:00:01.00,0:00:02.00,Default,,0,0,0,,a', DefaultEventFormat)
+
+
+class TestColor(unittest.TestCase):
+
+    def test_codec(self):
+        self.assertEqual(parse_color('&H64FB8336'), 0x64FB8336)
+        self.assertEqual(parse_color(' &h00ff00& '), 0x0000FF00)
+        self.assertEqual(parse_color('16777215'), 0x00FFFFFF)
+        self.assertEqual(parse_color('-1'), 0xFFFFFFFF)
+        self.assertEqual(format_color(0x64FB8336), '&H64FB8336')
+        self.assertEqual(format_color(0xFF), '&H000000FF')
+        self.assertRaises(ValueError, parse_color, '&Hxyz')
+
+        texts = ['&H00FFFFFF', '&H000000FF', '&H80112233'] * 3
+        colors = parse_colors(texts)
+        self.assertEqual(colors.typecode, 'L')
+        self.assertEqual(format_colors(colors), texts)
+
+    def test_tags_and_channels(self):
+        self.assertEqual(parse_tag_color('&H0000FF&'), 0x0000FF)
+        self.assertEqual(parse_tag_color('&H80FF0000'), 0xFF0000)
+        self.assertEqual(format_tag_color(0x80123456), '&H123456&')
+        self.assertEqual(parse_tag_alpha('&H80&'), 0x80)
+        self.assertEqual(format_tag_alpha(0x1FF), '&HFF&')
+
+        color = pack(0x11, 0x22, 0x33, 0x44)
+        self.assertEqual(color, 0x44332211)
+        self.assertEqual(unpack(color), (0x11, 0x22, 0x33, 0x44))
+        self.assertEqual(with_alpha(color, 0xFF), 0xFF332211)
+
+    def test_styles_round_trip(self):
+        ass = ASS(SAMPLE)
+        lines = SAMPLE.read_text(encoding='utf-8-sig').splitlines()
+        expected = [line.partition(':')[2].strip() for line in lines if line.startswith('Style:')]
+        self.assertEqual([style.to_row(ass.style_format) for style in ass.styles.values()], expected)
+        self.assertEqual(ass.styles['TITLE'].primary_color, 0x00FB8336)
+        self.assertEqual(ass.styles['TITLE'].background_color, 0x64FFFFFF)
+
+
+class TestTags(unittest.TestCase):
+
+    def test_round_trip(self):
+        texts = [
+            '', 'plain', r'{\b1}bold{\b0}', r'{\pos(10,20)\fad(100,200)}a\Nb', r'{comment}{\k10}ka{\kf20}ra',
+            r'{\t(0,100,\fs20\1c&HFF&)}x', r'{\p1}m 0 0 l 10 10{\p0}', r'{unclosed', r'}{', r'\\{\}',
+            r'{\fs 20}a', r'{\pos(10, 20)}a', r'{\fn Arial Black\b1 }a', r'{\t(0, 100, \fs20)}a', r'{\t( \fs 20 )}a',
+            r'{ \move( 1 ,2,3,4 ) \fad(7}a', r'{\clip(m 0 0 l 10 10)\p 1}m 0 0{\p0 }b'
+        ]
+        texts += [event.text for event in ASS(SAMPLE).events]
+        for text in texts:
+            self.assertEqual(build_text(parse_text(text)), text)
+
+    def test_whitespace(self):
+        tokens = parse_text(r'{\fs 20\pos(10, 20)\fn Arial Black}a{\t(0, 100, \fs 20)}b')
+        self.assertEqual(list(iter_tags(tokens)), [
+            ('fs', ('20',)), ('pos', ('10', '20')), ('fn', ('Arial Black',)),
+            ('t', ('0', '100', ((TAG, 'fs', ('20',)),)))
+        ])
+        # a changed block is written normalized, the others as they were
+        kind, source, value = tokens[0]
+        tokens = ((kind, source, value[:1] + ((TAG, 'pos', ('5', '6')),) + value[2:]),) + tokens[1:]
+        self.assertEqual(build_text(tokens), r'{\fs20\pos(5,6)\fnArial Black}a{\t(0, 100, \fs 20)}b')
+
+
+class TestEventTable(unittest.TestCase):
+
+    def operations(self) -> list:
+        events = [
+            Dialogue(start=start, end=start + length, layer=start % 3, style=('A', 'B')[start % 2])
+            for start, length in zip(range(0, 2000, 97), (50, 120, 300, 7, 60) * 5)
+        ]
+        results = []
+        events_table = table.EventTable(events)
+        results.append([list(events_table.style), events_table.style_names])
+        events_table.scale(25 / 24, origin=100).shift(-30).snap([0, 500, 1000, 1500], 20)
+        results.append([list(events_table.start), list(events_table.end)])
+
+        filtered = events_table.filter(styles=['B', 'C'], layers=[0, 1])
+        results.append([list(filtered.index), list(filtered.layer)])
+        clipped = events_table.clip(400, 1200)
+        results.append([list(clipped.index), list(clipped.start), list(clipped.end)])
+        mask = [index % 4 == 0 for index in range(len(events_table))]
+        results.append(list(events_table.filter(mask).index))
+
+        results.append([(event.start, event.end) for event in clipped.apply()])
+        results.append([(event.start, event.end, event.style) for event in events])
+        return results
+
+    def test_operations(self):
+        with mock.patch.object(table, 'numpy', None):
+            results = self.operations()
+        styles, times, filtered, clipped, masked, applied, events = results
+        self.assertEqual(styles, [[0, 1] * 10 + [0], ['A', 'B']])
+        self.assertEqual(times[0][:4], [-34, 67, 168, 269])
+        self.assertEqual(times[1][:4], [0, 192, 500, 276])
+        self.assertTrue(filtered[0])
+        self.assertTrue(all(index % 2 and layer < 2 for index, layer in zip(*filtered)))
+        self.assertTrue(all(400 <= start < end <= 1200 for start, end in zip(clipped[1], clipped[2])))
+        self.assertEqual(masked, list(range(0, 21, 4)))
+        self.assertEqual(events[clipped[0][0]][:2], applied[0])
+        # rows outside of the clipped table are not written back
+        self.assertEqual(events[0], (0, 50, 'A'))
+
+    @unittest.skipIf(table.numpy is None, 'NumPy is not installed')
+    def test_numpy_matches_python(self):
+        with mock.patch.object(table, 'numpy', None):
+            expected = self.operations()
+        self.assertEqual(self.operations(), expected)
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def test_against_brute_force(self):
+        generator = random.Random(1)
+        events = []
+        for _ in range(400):
+            start = generator.randrange(1000)
+            events.append(Dialogue(start=start, end=start + generator.choice((0, 1, 5, 50, 300))))
+        index = IntervalIndex(events)
+
+        for time in range(-5, 1400, 7):
+            expected = {id(event) for event in events if event.start <= time < event.end}
+            self.assertEqual({id(event) for event in index.events_at(time)}, expected)
+        for _ in range(300):
+            start = generator.randrange(-50, 1400)
+            end = start + generator.randrange(0, 200)
+            expected = {id(event) for event in events if event.start < end and event.end > start and start < end}
+            self.assertEqual({id(event) for event in index.events_between(start, end)}, expected)
+
+    def test_reversed_events(self):
+        events = [Dialogue(start=10, end=5), Dialogue(start=10, end=20), Dialogue(start=30, end=0)] * 5
+        index = IntervalIndex(events)
+        self.assertEqual(len(index), 15)
+        self.assertEqual(len(index.events_at(12)), 5)
+        self.assertEqual(len(index.events_between(0, 40)), 5)
+        self.assertEqual(len(IntervalIndex([Dialogue(start=10, end=5)]).events_at(7)), 0)
+
+
+class TestMappedASS(unittest.TestCase):
+
+    def test_matches_ass(self):
+        ass = ASS(SAMPLE)
+        rows = [(type(event).__name__, event.to_row(ass.event_format)) for event in ass.events]
+        with MappedASS(SAMPLE) as mapped:
+            self.assertEqual(mapped.script_info, ass.script_info)
+            self.assertEqual({name: style.to_row(ass.style_format) for name, style in mapped.styles.items()},
+                             snapshot(ass)[1])
+            self.assertEqual(len(mapped), len(ass.events))
+            self.assertEqual(mapped.event_format, ass.event_format)
+            found = [(type(event).__name__, event.to_row(mapped.event_format)) for event in mapped.iter_events()]
+            self.assertEqual(found, rows)
+            self.assertEqual((type(mapped[5]).__name__, mapped[5].to_row(mapped.event_format)), rows[5])
+            self.assertIn('events', mapped.sections)
+
+            for start, end in ((None, 10000), (10000, None), (30000, 60000), (0, 0)):
+                expected = [
+                    row for event, row in zip(ass.events, rows)
+                    if (start is None or event.end > start) and (end is None or event.start < end)
+                ]
+                found = [(type(event).__name__, event.to_row(mapped.event_format))
+                         for event in mapped.iter_events(start, end)]
+                self.assertEqual(found, expected)
+
+    def test_multibyte_encoding(self):
+        text = SAMPLE.read_text(encoding='utf-8-sig')
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory, 'sample.ass')
+            path.write_bytes(text.encode('gb18030'))
+            with MappedASS(path, 'gb18030') as mapped:
+                texts = [event.text for event in mapped.iter_events()]
+                self.assertEqual(texts, [event.text for event in ASS(SAMPLE).events])
+                self.assertEqual(set(mapped.styles), set(ASS(SAMPLE).styles))
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = pathlib.Path(directory.name)
+        self.script = self.directory / 'sample.ass'
+        self.script.write_bytes(SAMPLE.read_bytes())
+        self.cache = ParseCache(self.directory / 'cache')
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get(self.script))
+        expected = snapshot(self.cache.load(self.script))
+        self.assertEqual(expected, snapshot(ASS(SAMPLE)))
+        self.assertEqual(snapshot(self.cache.get(self.script)), expected)
+        self.assertIsNone(self.cache.get(self.script, 'auto'))
+
+        with open(self.script, 'a', encoding='utf-8') as file:
+            file.write('Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,appended\n')
+        self.assertIsNone(self.cache.get(self.script))
+        self.assertEqual(self.cache.load(self.script).events[-1].text, 'appended')
+
+    def test_corrupt_entries_are_dropped(self):
+        self.cache.load(self.script)
+        entry = self.cache.entry_path(self.script, 'utf-8-sig')
+        for content in (b'', b'garbage', pickle.dumps([])):
+            entry.write_bytes(content)
+            self.assertIsNone(self.cache.get(self.script))
+            self.assertFalse(entry.exists())
+
+    def test_eviction(self):
+        scripts = []
+        for index in range(3):
+            scripts.append(self.directory / '{}.ass'.format(index))
+            scripts[-1].write_bytes(SAMPLE.read_bytes())
+            self.cache.load(scripts[-1])
+        size = self.cache.entry_path(scripts[0], 'utf-8-sig').stat().st_size
+
+        self.cache.max_bytes = size * 2
+        self.cache.evict()
+        self.assertEqual(len(list(self.cache.directory.glob('*.pickle'))), 2)
+        self.cache.clear()
+        self.assertEqual(list(self.cache.directory.glob('*.pickle')), [])
+
+
+class TestStream(unittest.TestCase):
+
+    def test_inputs_give_the_same_lines(self):
+        text = SAMPLE.read_text(encoding='utf-8-sig')
+        text += 'Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,a\x85b\u2028c\x0cd\x1ce\x1df\x1eg\u2029h\n'
+        text = text.replace('\n', '\r\n')
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory, 'sample.ass')
+            path.write_bytes(text.encode('utf-8'))
+
+            expected = snapshot(ASS(path))
+            texts = [event.text for event in ASS(path).events]
+            self.assertEqual(texts[-1], 'a\x85b\u2028c\x0cd\x1ce\x1df\x1eg\u2029h')
+            for source in (text, text.encode('utf-8'), text.replace('\r\n', '\r'), open(path, 'rb')):
+                self.assertEqual(snapshot(ASS(source)), expected)
+            for source in (path, text, text.encode('utf-8')):
+                self.assertEqual([event.text for event in iter_events(source)], texts)
+            self.assertEqual(Document(text).lines, Document(path).lines)
+
+            mapped = MappedASS(path)
+            try:
+                self.assertEqual([event.text for event in mapped.iter_events()], texts)
+                self.assertEqual(mapped.script_info, expected[0])
+            finally:
+                mapped.close()
+
+
+def uuencode(data: bytes) -> str:
+    """ The SSA encoding as described in the specification, one group at a time. """
+    encoded = []
+    for position in range(0, len(data), 3):
+        group = data[position:position + 3]
+        value = int.from_bytes(group.ljust(3, b'\0'), 'big')
+        characters = [chr((value >> shift & 0x3F) + 33) for shift in (18, 12, 6, 0)]
+        encoded.extend(characters[:len(group) + 1])
+    return ''.join(encoded)
+
+
+class TestAttachments(unittest.TestCase):
+
+    def test_codec(self):
+        generator = random.Random(3)
+        for length in list(range(12)) + [59, 60, 61, 1000]:
+            data = bytes(generator.randrange(256) for _ in range(length))
+            encoded = uuencode(data)
+            self.assertEqual(encode(data), encoded)
+            self.assertEqual(decode(encoded), data)
+            broken = ' \n'.join(encoded[index:index + 7] for index in range(0, len(encoded), 7))
+            self.assertEqual(decode(broken), data)
+            self.assertEqual(decoded_size(len(encoded)), length)
+        self.assertRaises(ASSFileError, decode, 'abc~')
+
+    def test_reader(self):
+        data = bytes(range(256)) * 3
+        encoded = uuencode(data)
+        lines = [encoded[index:index + 80] for index in range(0, len(encoded), 80)]
+        # data lines that look like a section header or a comment still belong to the attachment
+        lines[1] = '[' + lines[1][1:-1] + ']'
+        lines[2] = ';' + lines[2][1:]
+        data = decode(''.join(lines))
+        attachments = read_attachments('fonts', ['fontname: a.ttf'] + lines + ['fontname: b.ttf', lines[-1]])
+        self.assertEqual([attachment.name for attachment in attachments], ['a.ttf', 'b.ttf'])
+        self.assertEqual(attachments[0].data, data)
+        self.assertEqual(len(attachments[0]), len(data))
+        self.assertEqual(attachments[1].data, decode(lines[-1]))
+
+    def test_script_round_trip(self):
+        fonts = [Attachment('a.ttf', data=bytes(range(256)) * 2), Attachment('b.ttf', data=b'xy')]
+        ass = ASS(SAMPLE)
+        ass.fonts = fonts
+        ass.graphics = [Attachment('c.png', data=b'\x89PNG' * 50)]
+        text = ass.to_text()
+        expected = [(font.name, font.data) for font in fonts]
+        self.assertIn('[Fonts]\nfontname: a.ttf\n', text)
+        data_lines = text.split('fontname: a.ttf\n')[1].split('fontname: b.ttf')[0].splitlines()
+        self.assertEqual([len(line) for line in data_lines], [80] * 8 + [43])
+
+        for parsed in (ASS(text), Document(text)):
+            self.assertEqual([(font.name, font.data) for font in parsed.fonts], expected)
+            self.assertEqual(parsed.graphics[0].data, b'\x89PNG' * 50)
+            self.assertEqual(parsed.to_text(), text)
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory, 'fonts.ass')
+            path.write_text(text, encoding='utf-8')
+            with MappedASS(path) as mapped:
+                self.assertEqual([(font.name, font.data) for font in mapped.fonts], expected)
+                self.assertEqual(len(mapped.graphics[0]), 200)
+
+
+class TestConvert(unittest.TestCase):
+
+    def test_formats(self):
+        events = [
+            Dialogue(start=100, end=200, style='Default', text=r'{\b1}a<b{\b0}\Nc\hd'),
+            Dialogue(start=0, end=50, text='first'), Dialogue(start=100, end=200, text='merged'),
+            Comment(start=0, end=10, text='comment'), Dialogue(start=5, end=5, text='empty'),
+            Dialogue(start=6, end=9, text=r'{\b1}')
+        ]
+        styles = ASS(SAMPLE).styles
+        self.assertEqual(
+            ''.join(iter_subtitles(events, 'srt', styles)),
+            '1\n00:00:00,000 --> 00:00:00,500\nfirst\n\n'
+            '2\n00:00:01,000 --> 00:00:02,000\n<b>a<b</b>\nc\u00a0d\nmerged\n\n'
+        )
+        self.assertEqual(
+            ''.join(iter_subtitles(events, 'vtt', styles, markup=False)),
+            'WEBVTT\n\n00:00:00.000 --> 00:00:00.500\nfirst\n\n'
+            '00:00:01.000 --> 00:00:02.000\na&lt;b\nc\u00a0d\nmerged\n\n'
+        )
+        self.assertIn(
+            '<p begin="00:00:01.000" end="00:00:02.000">'
+            '<span tts:fontWeight="bold">a&lt;b</span><br/>c\u00a0d<br/>merged</p>',
+            ''.join(iter_subtitles(events, 'ttml', styles))
+        )
+        self.assertRaises(ValueError, lambda: list(iter_subtitles(events, 'sub')))
+
+    def test_window(self):
+        events = [Dialogue(start=start, end=start + 10, text=str(start)) for start in range(0, 1000, 10)]
+        expected = list(iter_cues(events))
+        self.assertEqual([cue.start for cue in expected], list(range(0, 1000, 10)))
+        self.assertEqual(list(iter_cues(events, window=1)), expected)
+
+        events[50], events[53] = events[53], events[50]
+        self.assertEqual(list(iter_cues(events)), expected)
+        self.assertEqual(list(iter_cues(events, window=3)), expected)
+        with self.assertRaises(OutOfOrderError):
+            list(iter_cues(events, window=2))
+
+    def test_convert_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            outputs = {}
+            for window in (None, 2, 4096):
+                output = pathlib.Path(directory, str(window))
+                output.mkdir()
+                written = convert_file(SAMPLE, formats=FORMATS, directory=output, window=window)
+                self.assertEqual(written, [str(output / ('test.' + target)) for target in FORMATS])
+                outputs[window] = [pathlib.Path(path).read_text(encoding='utf-8') for path in written]
+            self.assertEqual(outputs[2], outputs[None])
+            self.assertEqual(outputs[4096], outputs[None])
+
+            output = pathlib.Path(directory, 'cli')
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                status = convert_main([str(SAMPLE), '--output', str(output), '--window', '2', '--workers', '1'])
+            self.assertEqual(status, 0)
+            self.assertEqual(printed.getvalue().splitlines(), [str(output / 'test.srt'), str(output / 'test.vtt')])
+            self.assertEqual((output / 'test.srt').read_text(encoding='utf-8'), outputs[None][0])
+
+
+class TestEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name: str, content: bytes) -> pathlib.Path:
+        path = pathlib.Path(self.directory.name, name)
+        path.write_bytes(content)
+        return path
+
+    def test_detect_encoding(self):
+        cases = [
+            (codecs.BOM_UTF8 + b'[Script Info]', 'utf-8-sig'), ('[Script Info]'.encode('utf-16'), 'utf-16'),
+            ('[Script Info]'.encode('utf-32'), 'utf-32'), ('[Script Info]'.encode('utf-16-le'), 'utf-16-le'),
+            ('[Script Info]'.encode('utf-16-be'), 'utf-16-be'), (b'[Script Info]', 'utf-8'),
+            ('这是中文的字幕，我们在这里'.encode('gbk'), 'gbk'), ('這是中文的字幕，我們在這裡'.encode('cp950'), 'cp950'),
+            ('これはひらがなのテキストです'.encode('cp932'), 'cp932'), ('中文字幕'.encode('utf-8')[:-1], 'utf-8')
+        ]
+        for head, encoding in cases:
+            self.assertEqual(detect_encoding(head), encoding)
+
+    def test_auto_matches_declared_encoding(self):
+        expected = snapshot(ASS(SAMPLE))
+        for saved, opened in (('utf-8-sig', 'auto'), ('utf-16', 'auto'), ('utf-16-be', 'auto'), ('gb18030', 'gb18030')):
+            path = self.write('sample.ass', SAMPLE.read_text(encoding='utf-8-sig').encode(saved))
+            self.assertEqual(snapshot(ASS(path, opened)), expected)
+
+    def test_mapped_rejects_utf16_and_utf32(self):
+        text = SAMPLE.read_text(encoding='utf-8-sig')
+        for encoding in ('utf-16', 'UTF16', 'utf_16_le', 'utf-32', 'U32'):
+            path = self.write('sample.ass', text.encode(encoding))
+            with self.assertRaises(ASSFileError):
+                MappedASS(path, encoding)
+        with self.assertRaises(ASSFileError):
+            MappedASS(path, 'auto')
+
+        path = self.write('sample.ass', text.encode('utf-16'))
+        reference = self.write('reference.ass', text.encode('utf-8'))
+        for source in (path, reference):
+            output = pathlib.Path(self.directory.name, source.stem)
+            output.mkdir()
+            convert_file(source, 'utf-16' if source == path else 'utf-8', formats=('srt',), directory=output)
+        self.assertEqual(pathlib.Path(self.directory.name, 'sample', 'sample.srt').read_text(encoding='utf-8'),
+                         pathlib.Path(self.directory.name, 'reference', 'reference.srt').read_text(encoding='utf-8'))
+
+
+class TestStyleResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.styles = ASS(SAMPLE).styles
+        self.resolver = StyleResolver(self.styles)
+
+    def test_base_style(self):
+        self.assertIs(self.resolver.base_style('JP'), self.styles['JP'])
+        self.assertIs(self.resolver.base_style('missing'), self.styles['Default'])
+        self.assertEqual(StyleResolver({}).base_style('missing').name, 'Default')
+
+    def test_runs(self):
+        event = Dialogue(style='TITLE', text=r'a{\b0\fs30}b{\fn X\fs}c{\rJP}d{\4c&H0000FF&}e{\r}f{\p1}m 0 0')
+        runs = self.resolver.runs(event)
+        self.assertEqual([(kind, text) for kind, text, _ in runs],
+                         [(0, 'a'), (0, 'b'), (0, 'c'), (0, 'd'), (0, 'e'), (0, 'f'), (1, 'm 0 0')])
+        a, b, c, d, e, f, drawing = [style for _, _, style in runs]
+        title = self.styles['TITLE']
+        self.assertIs(a, title)
+        self.assertEqual((b.bold, b.font_size, b.font_name), (0, 30, title.font_name))
+        self.assertEqual((c.bold, c.font_size, c.font_name), (0, title.font_size, 'X'))
+        self.assertIs(d, self.styles['JP'])
+        # a color tag keeps the alpha of the style
+        self.assertEqual(e.background_color, 0x000000FF)
+        self.assertIs(f, title)
+        self.assertIs(drawing, title)
+        self.assertEqual(self.resolver.runs(Dialogue(style='TITLE', text=r'{\4c&H0000FF&}x'))[0][2].background_color,
+                         0x640000FF)
+
+        self.assertIs(self.resolver.event_style(event), title)
+        self.assertIs(self.resolver.style_at(event, 1), b)
+        self.assertIsNone(self.resolver.style_at(event, 100))
+        self.assertIs(self.resolver.event_style(Dialogue(style='JP')), self.styles['JP'])
+
+    def test_memoized(self):
+        first = self.resolver.runs(Dialogue(style='JP', text=r'{\k10\b0}a{\k20}b'))
+        second = self.resolver.runs(Dialogue(style='JP', text=r'{\b0\k5}c'))
+        self.assertIs(first[0][2], first[1][2])
+        self.assertIs(first[0][2], second[0][2])
+        self.assertEqual(len(self.resolver), 1)
+        self.resolver.invalidate()
+        self.assertEqual(len(self.resolver), 0)
+        self.assertIsNot(self.resolver.runs(Dialogue(style='JP', text=r'{\b0}c'))[0][2], first[0][2])
+
+
+class TestCollisions(unittest.TestCase):
+
+    def collisions(self, *texts_and_margins):
+        events = [
+            Dialogue(start=100 * index, end=100 * index + 250, style='Default', text=text, margin_v=margin_v)
+            for index, (text, margin_v) in enumerate(texts_and_margins)
+        ]
+        styles = ASS(SAMPLE).styles
+        return [(events.index(first), events.index(second), position.alignment)
+                for position, first, second in find_collisions(events, styles)]
+
+    def test_groups(self):
+        self.assertEqual(self.collisions(('a', 0), ('b', 0), ('c', 0)), [(0, 1, 2), (0, 2, 2), (1, 2, 2)])
+        self.assertEqual(self.collisions(('a', 0), ('b', 10), ('c', 30)), [(0, 1, 2)])
+        self.assertEqual(self.collisions((r'{\an8}a', 0), ('b', 0), (r'{\a6}c', 0)), [(0, 2, 8)])
+        self.assertEqual(self.collisions((r'{\pos(1,2)}a', 0), (r'{\move(1,2,3,4)}b', 0), ('c', 0)), [])
+
+        events = [Dialogue(start=0, end=10, style='Default'), Comment(start=0, end=10, style='Default')]
+        self.assertEqual(len(list(find_collisions(events, {}))), 0)
+        self.assertEqual(len(list(find_collisions(events, {}, include_comments=True))), 1)
+
+    def test_first_alignment_tag_wins(self):
+        self.assertEqual(self.collisions((r'{\an8}a{\an2}b', 0), (r'{\an8}c', 0)), [(0, 1, 8)])
+        self.assertEqual(self.collisions((r'{\a6\an2}a', 0), (r'{\an8}c', 0)), [(0, 1, 8)])
+        self.assertEqual(self.collisions((r'{\anx\an8}a', 0), (r'{\an8\an2}c', 0)), [(0, 1, 8)])
+
+
+class TestDocument(unittest.TestCase):
+
+    def assertMatchesReparse(self, document: Document):
+        self.assertEqual(snapshot(document), snapshot(Document('\n'.join(document.lines))))
+
+    def test_insert_at_section_header(self):
+        document = Document(SAMPLE)
+        header = document.lines.index('[Events]')
+        style = next(line for line in document.lines if line.startswith('Style:')).replace('Style: Default', 'Style: X')
+        document.replace_lines(header, header, [style])
+        self.assertIn('X', document.styles)
+        self.assertMatchesReparse(document)
+
+        document.replace_lines(0, 0, [next(line for line in document.lines if line.startswith('Dialogue:'))])
+        self.assertMatchesReparse(document)
+
+    def test_invalid_row_leaves_document_unchanged(self):
+        document = Document(SAMPLE)
+        before = snapshot(document), list(document.lines)
+        line = next(index for index, text in enumerate(document.lines) if text.startswith('Dialogue:'))
+        for text in ('Dialogue: x,0:00:0', 'Dialogue: 0,0:00:0x.00,0:00:01.00,Default,,0,0,0,,a'):
+            with self.assertRaises((ASSFileError, ValueError)):
+                document.replace_lines(line, line + 1, [text])
+            self.assertEqual((snapshot(document), document.lines), before)
+
+    def test_random_edits_match_reparse(self):
+        generator = random.Random(2)
+        document = Document(SAMPLE)
+        pool = list(document.lines) + ['', 'Format: Layer, Start, End, Style, Text', 'Title: edited', '[Extra]', 'x']
+        for _ in range(300):
+            start = generator.randrange(len(document.lines) + 1)
+            end = min(start + generator.choice((0, 0, 1, 1, 2, 5)), len(document.lines))
+            new_lines = [generator.choice(pool) for _ in range(generator.choice((0, 1, 1, 2, 3)))]
+            before = snapshot(document), list(document.lines)
+            try:
+                document.replace_lines(start, end, new_lines)
+            except (ASSFileError, ValueError):
+                # rows of one format moved under another may not decode
+                self.assertEqual((snapshot(document), document.lines), before)
+                continue
+            self.assertMatchesReparse(document)
+
+    def test_apply_edit_counts_utf16(self):
+        document = Document(b'[Events]\nDialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,\xf0\x9f\x98\x80ab\n')
+        line = document.lines[1]
+        character = len(line[:line.rindex('a')].encode('utf-16-le')) // 2
+        document.apply_edit(1, character, 1, character + 1, 'X')
+        self.assertEqual(document.events[0].text, '\U0001F600Xb')
+
+    def test_dump_matches_to_text(self):
+        document = Document(SAMPLE)
+        document.replace_lines(1, 1, ['; note'])
+        text = io.StringIO()
+        document.dump(text)
+        self.assertEqual(text.getvalue(), document.to_text())
+        self.assertEqual(document.to_text(), '\n'.join(document.lines) + '\n')
+
+
+class TestClone(unittest.TestCase):
+
+    def test_isolation(self):
+        original = ASS(SAMPLE)
+        expected = snapshot(original)
+        clone = original.clone()
+        self.assertIs(clone.events[0], original.events[0])
+
+        event = clone.own_event(0)
+        self.assertIs(clone.own_event(0), event)
+        event.text = 'changed'
+        clone.own_style('Default').font_size = 99
+        clone.script_info['Title'] = 'clone'
+        clone.nonstandard_sections.setdefault('Extra', []).append('line')
+        next(iter(clone.nonstandard_sections.values())).append('more')
+        del clone.events[1]
+        clone.retime(offset=100)
+        clone.scale_karaoke(2)
+        self.assertEqual(snapshot(original), expected)
+        self.assertEqual(clone.events[0].text, 'changed')
+        self.assertEqual(clone.events[1].start, original.events[2].start + 100)
+
+        # and the other way round, also through a clone of the clone
+        second = clone.clone()
+        original.own_event(0).text = 'original'
+        original.event_table().shift(50).apply()
+        self.assertEqual(second.events[0].text, 'changed')
+        self.assertEqual(clone.events[1].start, original.events[2].start + 50)
+        second.own_event(0).text = 'second'
+        self.assertEqual((original.events[0].text, clone.events[0].text), ('original', 'changed'))
+
+    def test_pickle_is_independent(self):
+        original = ASS(SAMPLE)
+        clone = pickle.loads(pickle.dumps(original.clone()))
+        clone.events[0].text = 'changed'
+        self.assertNotEqual(original.events[0].text, 'changed')
+
+
+class TestKaraoke(unittest.TestCase):
+
+    TEXT = r'{\an8}{\k10\1c&HFF&}ka{\kf20}ra{\b1\ko5}o{\K0}ke'
+
+    def test_parse(self):
+        event = Dialogue(start=100, end=200, text=self.TEXT)
+        karaoke = event.karaoke
+        self.assertIs(event.karaoke, karaoke)
+        self.assertEqual((karaoke.kinds, list(karaoke.durations)), (('k', 'kf', 'ko', 'K'), [10, 20, 5, 0]))
+        self.assertEqual((karaoke.texts, karaoke.duration, len(karaoke)), (('ka', 'ra', 'o', 'ke'), 35, 4))
+        self.assertEqual(list(karaoke.offsets()), [0, 10, 30, 35, 35])
+        self.assertEqual([tuple(syllable) for syllable in karaoke.syllables(event.start)],
+                         [(100, 110, 'k', 'ka'), (110, 130, 'kf', 'ra'), (130, 135, 'ko', 'o'), (135, 135, 'K', 'ke')])
+        self.assertEqual(build_text(karaoke.to_tokens()), self.TEXT)
+        self.assertEqual(len(Dialogue(text='plain').karaoke), 0)
+
+        event.text = r'{\k7}a'
+        self.assertEqual(list(event.karaoke.durations), [7])
+
+    def test_scale_and_split(self):
+        event = Dialogue(text=self.TEXT)
+        # the boundaries are rounded, so the total is 35 * 1.5 rounded once
+        event.karaoke = event.karaoke.scaled(1.5)
+        self.assertEqual(event.text, r'{\an8}{\k15\1c&HFF&}ka{\kf30}ra{\b1\ko8}o{\K0}ke')
+        self.assertEqual(event.karaoke.duration, 53)
+
+        event.karaoke = event.karaoke.split(1, ['r', 'a'])
+        self.assertEqual(event.text, r'{\an8}{\k15\1c&HFF&}ka{\kf15}r{\kf15}a{\b1\ko8}o{\K0}ke')
+        self.assertEqual(list(event.karaoke.split(0, ['k', '', 'a']).durations), [7, 0, 8, 15, 15, 8, 0])
+        self.assertRaises(ValueError, event.karaoke.split, 0, ['k', 'x'])
+        self.assertRaises(ValueError, Dialogue(text=r'{\k10}a{\b1}b').karaoke.split, 0, ['a', 'b'])
+        self.assertRaises(ValueError, event.karaoke.with_durations, [1, 2])
+
+    def test_bulk(self):
+        events = [Dialogue(start=0, text=self.TEXT), Dialogue(start=50, text='plain \\kappa'),
+                  Dialogue(start=500, text=r'{\k20}x{\k30}y')]
+        self.assertEqual(list(karaoke_events(events)), [events[0], events[2]])
+        indices, starts, ends, texts = syllable_table(events)
+        self.assertEqual((list(indices), list(starts), list(ends), texts), (
+            [0, 0, 0, 0, 2, 2], [0, 10, 30, 35, 500, 520], [10, 30, 35, 35, 520, 550], ['ka', 'ra', 'o', 'ke', 'x', 'y']
+        ))
+
+        self.assertEqual(scale_karaoke(events, 2), 2)
+        self.assertEqual(events[2].text, r'{\k40}x{\k60}y')
+        self.assertEqual(events[1].text, 'plain \\kappa')
+
+        ass = ASS()
+        ass.events = events
+        clone = ass.clone()
+        self.assertEqual(clone.scale_karaoke(0.5), 2)
+        self.assertEqual((clone.events[2].text, events[2].text), (r'{\k20}x{\k30}y', r'{\k40}x{\k60}y'))
+        self.assertIs(clone.events[1], events[1])
+
+
+class TestMerge(unittest.TestCase):
+
+    def test_one_sided_changes(self):
+        base = ASS(SAMPLE)
+        ours = base.clone()
+        ours.own_event(3).text = 'changed'
+        del ours.events[10]
+        ours.events.insert(20, Dialogue(start=5, end=10, text='inserted'))
+        ours.script_info['Title'] = 'merged'
+
+        for merged in (merge_documents(base, ours, base), merge_documents(base, base, ours)):
+            self.assertEqual(merged.conflicts, [])
+            self.assertEqual(snapshot(merged.document), snapshot(ours))
+
+    def test_field_merge_and_conflict(self):
+        base = ASS(SAMPLE)
+        ours, theirs = base.clone(), base.clone()
+        ours.own_event(3).text = 'translated'
+        theirs.own_event(3).start += 10
+        ours.own_event(4).text = 'ours'
+        theirs.own_event(4).text = 'theirs'
+
+        result = merge_documents(base, ours, theirs)
+        self.assertEqual(result.document.events[3].text, 'translated')
+        self.assertEqual(result.document.events[3].start, base.events[3].start + 10)
+        self.assertEqual([(conflict.key, conflict.fields) for conflict in result.conflicts], [(4, ('text',))])
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_stats(self):
+        reported = []
+        ass = ASS(SAMPLE, profiler=ParseProfiler(callback=reported.append))
+        stats = ass.parse_stats
+        self.assertEqual(reported, [stats])
+        self.assertEqual(stats.source, str(SAMPLE))
+        self.assertEqual(stats.bytes, SAMPLE.stat().st_size)
+        self.assertEqual(stats.lines, len(SAMPLE.read_text(encoding='utf-8-sig').splitlines()))
+        self.assertEqual((stats.styles, stats.events), (len(ass.styles), len(ass.events)))
+        self.assertTrue({'open', 'preamble', 'script_info', 'styles', 'events'} <= set(stats.phases))
+        self.assertEqual(stats.to_dict()['phases']['events']['lines'], stats.phases['events'].lines)
+        self.assertEqual(snapshot(ass), snapshot(ASS(SAMPLE)))
+
+    def test_hooks(self):
+        reported = []
+        add_hook(reported.append)
+        try:
+            ASS(SAMPLE)
+        finally:
+            remove_hook(reported.append)
+        ASS(SAMPLE)
+        self.assertEqual([stats.events for stats in reported], [len(ASS(SAMPLE).events)])
+
+    def test_failed_parse_stops_tracing(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        profiler = ParseProfiler(trace_allocations=True)
+        with self.assertRaises(ASSFileError):
+            ASS(b'[Events]\nFormat: Layer, Start, End, Style, Text\nDialogue: 1,2\n', profiler=profiler)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        ass = ASS(SAMPLE, profiler=profiler)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsNotNone(ass.parse_stats.allocations)
+        self.assertIsNotNone(ass.parse_stats.phases['events'].allocated)
+
+
+class TestRetime(unittest.TestCase):
+
+    def test_scale_offset_and_tags(self):
+        events = [
+            Dialogue(start=100, end=300, text=r'{\fad(100,200)\move(1,2,3,4,10,20)\t(0,100,\fs20)}x'),
+            Dialogue(start=1000, end=1010, text=r'{\fad(1)\fade(1,2,3,4,5,6,7)\t(\fs20)}y'),
+            Dialogue(start=50, end=60, text='plain')
+        ]
+        retimed = retime(events, offset=5, scale=2, origin=100, rewrite_tags=True)
+        self.assertEqual([(event.start, event.end) for event in retimed], [(105, 505), (1905, 1925), (5, 25)])
+        self.assertEqual(
+            [event.text for event in retimed],
+            [r'{\fad(200,400)\move(1,2,3,4,20,40)\t(0,200,\fs20)}x', r'{\fad(1)\fade(1,2,3,8,10,12,14)\t(\fs20)}y',
+             'plain']
+        )
+
+    def test_keyframes(self):
+        self.assertEqual(load_keyframes(['# keyframe format v1', 'fps 23.976', '48', '24']),
+                         ([24, 48], Fraction(24000, 1001)))
+        self.assertEqual(load_keyframes(['# XviD 2pass stat file', 'i', 'p', 'b', 'I', '']), ([0, 3], None))
+        self.assertEqual(load_keyframes(['5', '3']), ([3, 5], None))
+
+        events = [Dialogue(start=103, end=203), Dialogue(start=130, end=170)]
+        retime(events, keyframes=[24, 48], fps=23.976, max_distance=5)
+        self.assertEqual([(event.start, event.end) for event in events], [(100, 200), (130, 170)])
+        self.assertRaises(ValueError, retime, events, keyframes=[24])
+
+
+if __name__ == '__main__':
+    unittest.main()